@@ -1,13 +1,44 @@
 from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
-from pymongo import MongoClient
-from werkzeug.security import generate_password_hash, check_password_hash
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from werkzeug.middleware.proxy_fix import ProxyFix
 import secrets
 import os
-from datetime import datetime
+import sys
+import json
+import click
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
 from typing import Any, Dict
 from dotenv import load_dotenv
 
+from assets import StaticAssets
+from datastore import DataStore, MODE_MONGO
+from leaderboard import GLOBAL, Leaderboard, StreakTracker, subject_board, week_board
+from metrics import Metrics
+from pagecache import PageCache
+from passwords import HashingBusy, PasswordHasher
+from quizbank import QuizBank
+import roster
+from ratelimit import TokenBucketLimiter
+from write_buffer import WriteBehindBuffer
+
 app = Flask(__name__, static_folder='static', template_folder='templates')
+# Fingerprinted url_for('static', ...) URLs, immutable caching, .gz/.br variants
+assets = StaticAssets(app)
+# Lesson pages are identical for every visitor: render once, serve with ETags
+app.config['PAGE_CACHE'] = os.environ.get("PAGE_CACHE", "1").lower() not in ("0", "false", "no")
+pages = PageCache(app)
+
+# -------------------- METRICS --------------------
+# Per-route latency, MongoDB command timings and a slow-query log, served as
+# Prometheus text at /metrics (set METRICS_TOKEN to require a bearer token).
+metrics = Metrics(
+    app,
+    slow_query_ms=float(os.environ.get("SLOW_QUERY_MS", "100")),
+    token=os.environ.get("METRICS_TOKEN") or None,
+)
 
 # -------------------- SECRET KEY --------------------
 # Read from Railway → Variables
@@ -15,64 +46,177 @@ app.secret_key = os.environ.get("SECRET_KEY", secrets.token_hex(32))
 
 # -------------------- MONGO DB CONNECTION --------------------
 load_dotenv()  # Load variables from a local .env if present (dev convenience)
-class MockCollection:
-    def __init__(self):
-        self._data = []
-
-    def find_one(self, query):
-        for doc in self._data:
-            if all(doc.get(k) == v for k, v in query.items()):
-                return doc
-        return None
-
-    def insert_one(self, doc):
-        self._data.append(dict(doc))
-
-    def update_one(self, filter_q, update):
-        doc = self.find_one(filter_q)
-        if not doc:
-            return
-        if '$set' in update:
-            for k, v in update['$set'].items():
-                parts = k.split('.')
-                target = doc
-                for p in parts[:-1]:
-                    target = target.setdefault(p, {})
-                target[parts[-1]] = v
-        if '$inc' in update:
-            for k, v in update['$inc'].items():
-                parts = k.split('.')
-                target = doc
-                for p in parts[:-1]:
-                    target = target.setdefault(p, {})
-                target[parts[-1]] = target.get(parts[-1], 0) + v
-        if '$push' in update:
-            for k, v in update['$push'].items():
-                target = doc.setdefault(k, [])
-                if isinstance(v, dict) and '$each' in v:
-                    target.extend(v['$each'])
-                else:
-                    target.append(v)
 
 # -------------------- CONNECT TO REAL MONGO DB --------------------
-try:
-    # Support both names to avoid confusion across guides/platforms
-    MONGO_URI = os.environ.get("MONGO_URI") or os.environ.get("MONGODB_URI")
-    client = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
-
-    # Test MongoDB connection
-    client.admin.command('ping')
-    print("MongoDB Atlas connected successfully!")
-
-    db = client['logindb']
-    users = db['users']
-    parents = db['parents']
-
-except Exception as e:
-    print("MongoDB connection failed:", e)
-    print("Using fallback in-memory DB for development.")
-    users = MockCollection()
-    parents = MockCollection()
+# The client is created lazily in each worker process (never at import, never
+# shared across fork) and a background ping switches between MongoDB and the
+# in-memory fallback at runtime. See datastore.py.
+# Support both names to avoid confusion across guides/platforms
+MONGO_URI = os.environ.get("MONGO_URI") or os.environ.get("MONGODB_URI")
+store = DataStore(
+    MONGO_URI,
+    client_options={
+        'maxPoolSize': int(os.environ.get("MONGO_MAX_POOL_SIZE", "50")),
+        'minPoolSize': int(os.environ.get("MONGO_MIN_POOL_SIZE", "0")),
+        'maxIdleTimeMS': int(os.environ.get("MONGO_MAX_IDLE_TIME_MS", "300000")),
+        'serverSelectionTimeoutMS': int(os.environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000")),
+        'event_listeners': [metrics.command_listener],
+    },
+    startup_timeout=float(os.environ.get("MONGO_STARTUP_TIMEOUT", "1.5")),
+    health_interval=float(os.environ.get("MONGO_HEALTH_INTERVAL", "10")),
+    # MEMSTORE_SNAPSHOT=path/to/file.json keeps fallback data across restarts
+    snapshot_path=os.environ.get("MEMSTORE_SNAPSHOT") or None,
+    snapshot_interval=float(os.environ.get("MEMSTORE_SNAPSHOT_INTERVAL", "30")),
+)
+users = store.collection('users')
+parents = store.collection('parents')
+activity = store.collection('activity')
+
+def store_metrics():
+    for mode, calls in store.calls.items():
+        yield 'app_db_calls_total', {'mode': mode}, calls
+        yield 'app_db_mode', {'mode': mode}, int(store.mode == mode)
+    yield 'app_db_mode_changes_total', {}, store.mode_changes
+
+metrics.describe('app_db_calls_total', 'counter', 'Collection calls served by MongoDB vs the in-memory fallback.')
+metrics.describe('app_db_mode', 'gauge', '1 for the backend this worker is currently using.')
+metrics.describe('app_db_mode_changes_total', 'counter', 'Switches between MongoDB and the fallback.')
+metrics.collector(store_metrics)
+
+# Same indexes on Mongo and on the fallback store: logins, signup duplicate
+# checks and parent lookups are all point reads on these fields. They are
+# created the first time each backend is used.
+store.add_index('users', 'email', unique=True)
+store.add_index('parents', 'email', unique=True)
+store.add_index('parents', 'child_email')
+store.add_index('activity', [('email', 1), ('day', -1)])
+store.add_index('leaderboard', [('board', 1), ('member', 1)], unique=True)
+
+# -------------------- WRITE-BEHIND PROGRESS BUFFER --------------------
+# WRITE_BEHIND=1 coalesces progress/quiz credit writes per student and flushes
+# them with bulk_write at most WRITE_BEHIND_MAX_STALENESS seconds later.
+progress_writes = None
+activity_writes = None
+if os.environ.get("WRITE_BEHIND", "").lower() in ("1", "true", "yes"):
+    _staleness = float(os.environ.get("WRITE_BEHIND_MAX_STALENESS", "2"))
+    _max_pending = int(os.environ.get("WRITE_BEHIND_MAX_PENDING", "500"))
+    progress_writes = WriteBehindBuffer(users, max_staleness=_staleness, max_pending=_max_pending)
+    activity_writes = WriteBehindBuffer(activity, max_staleness=_staleness, max_pending=_max_pending)
+
+def update_progress(email, update):
+    if progress_writes is not None:
+        progress_writes.add({'email': email}, update)
+    else:
+        users.update_one({'email': email}, update)
+
+# -------------------- ACTIVITY LOG --------------------
+# The full history lives in `activity`, one document per student per day
+# holding at most ACTIVITY_BUCKET_SIZE items (a full bucket rolls over to a
+# new document for the same day). Users keep only the newest
+# RECENT_WORKS_LIMIT entries in `completed_works` for the dashboard.
+ACTIVITY_BUCKET_SIZE = 100
+RECENT_WORKS_LIMIT = 20
+LEGACY_ACTIVITY_DAY = '0000-00-00'  # entries migrated without a timestamp
+
+def log_activity(email, works):
+    now = datetime.now()
+    items = [{'work': w, 'at': now.strftime('%Y-%m-%d %H:%M:%S')} for w in works]
+    bucket = {'email': email, 'day': now.strftime('%Y-%m-%d'), 'count': {'$lt': ACTIVITY_BUCKET_SIZE}}
+    update = {'$push': {'items': {'$each': items}}, '$inc': {'count': len(items)}}
+    if activity_writes is not None:
+        activity_writes.add(bucket, update, upsert=True)
+    else:
+        activity.update_one(bucket, update, upsert=True)
+
+# Games post a tick every round; like the old $addToSet on completed_works,
+# each pre-primary work is logged (and counted) at most once a day. Each
+# worker remembers what it has logged so repeat ticks cost no extra writes.
+LOGGED_WORKS_CACHE = 100000
+_logged_works: 'OrderedDict[Any, bool]' = OrderedDict()
+_logged_works_lock = threading.Lock()
+
+def unlogged_today(email, works):
+    """The subset of ``works`` not yet in ``email``'s activity log today."""
+    day = datetime.now().strftime('%Y-%m-%d')
+    fresh = []
+    with _logged_works_lock:
+        for work in works:
+            key = (email, day, work)
+            if key not in _logged_works:
+                _logged_works[key] = True
+                fresh.append(work)
+        while len(_logged_works) > LOGGED_WORKS_CACHE:
+            _logged_works.popitem(last=False)
+    # Another worker (or this one before a restart) may have logged it
+    return [w for w in fresh
+            if activity.find_one({'email': email, 'day': day, 'items.work': w}, {'_id': 1}) is None]
+
+def recent_works_push(works):
+    return {'completed_works': {'$each': list(works), '$slice': -RECENT_WORKS_LIMIT}}
+
+# -------------------- DASHBOARD SUMMARY --------------------
+# `summary` is a small sub-document holding everything the parent dashboard's
+# stats need. Every write that changes progress also updates it with $inc/$set
+# so the dashboard never has to recompute from the full document.
+PREPRIMARY_SECTIONS = ['colors', 'animals', 'fruits', 'vegetables', 'numbers', 'strokes']
+SECTION_FIELDS = ('video_watched', 'games_played', 'quiz_score', 'last_updated')
+# Set only by build_summary: $inc/$set writes on a user without a summary
+# create a partial one, which `v` tells apart from a complete one.
+SUMMARY_VERSION = 1
+
+def build_summary(user, logged_works=0):
+    progress = user.get('progress') or {}
+    sections = {}
+    for sec, state in (user.get('preprimary_progress') or {}).items():
+        sections[sec] = {k: state[k] for k in SECTION_FIELDS if k in state}
+    return {
+        'v': SUMMARY_VERSION,
+        'progress_total': sum(v or 0 for v in progress.values()),
+        'subject_count': len(progress),
+        'works_count': max(logged_works, user.get('works_count', 0), len(user.get('completed_works') or [])),
+        'achievements_count': len(user.get('achievements') or []),
+        'time_spent': user.get('time_spent', 0),
+        'last_activity': user.get('last_activity', 'Never'),
+        'sections': sections,
+    }
+
+def logged_works_count(email):
+    return sum(b.get('count', 0) for b in activity.find({'email': email}, {'_id': 0, 'count': 1}))
+
+# -------------------- PASSWORDS + LOGIN THROTTLING --------------------
+# Hashing runs in a bounded process pool (PASSWORD_HASH_WORKERS=0 hashes
+# inline). Stored hashes that don't match PASSWORD_HASH_METHOD are upgraded
+# on the next successful login.
+hasher = PasswordHasher(
+    method=os.environ.get("PASSWORD_HASH_METHOD", "scrypt"),
+    workers=int(os.environ.get("PASSWORD_HASH_WORKERS", "2")),
+    max_pending=int(os.environ.get("PASSWORD_HASH_MAX_PENDING", "32")),
+    observe=metrics.observe_section,
+)
+# Token buckets checked before any lookup or hash work. The per-IP bucket is
+# generous because a whole classroom usually shares one address.
+ip_limiter = TokenBucketLimiter(
+    burst=int(os.environ.get("LOGIN_IP_BURST", "60")),
+    per_minute=float(os.environ.get("LOGIN_IP_PER_MINUTE", "60")),
+)
+email_limiter = TokenBucketLimiter(
+    burst=int(os.environ.get("LOGIN_EMAIL_BURST", "5")),
+    per_minute=float(os.environ.get("LOGIN_EMAIL_PER_MINUTE", "5")),
+)
+# Behind Render/Railway the client IP arrives in X-Forwarded-For
+if os.environ.get("PROXY_FIX_HOPS"):
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=int(os.environ["PROXY_FIX_HOPS"]))
+
+def login_allowed(email):
+    return ip_limiter.allow(f'ip:{request.remote_addr}') and email_limiter.allow(f'email:{email.lower()}')
+
+def upgrade_hash(collection, doc_id, password):
+    # Best effort: when the hashing pool is full the login still succeeds
+    # and the hash is upgraded on a later one.
+    try:
+        collection.update_one({'_id': doc_id}, {'$set': {'password': hasher.hash(password)}})
+    except HashingBusy:
+        pass
 
 # -------------------- AUTH --------------------
 @app.route('/')
@@ -84,13 +228,25 @@ def do_login():
     email = request.form['email']
     password = request.form['password']
 
-    user = users.find_one({'email': email})
-    if user and check_password_hash(user['password'], password):
+    if not login_allowed(email):
+        flash('Too many login attempts. Please wait a minute and try again.', 'error')
+        return redirect(url_for('login'))
+
+    user = users.find_one({'email': email}, {'password': 1, 'name': 1})
+    try:
+        ok, rehash = hasher.verify(user['password'], password) if user else (False, False)
+    except HashingBusy:
+        flash('The server is busy. Please try again in a moment.', 'error')
+        return redirect(url_for('login'))
+
+    if ok:
+        if rehash:
+            upgrade_hash(users, user['_id'], password)
 
         current_date = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
         users.update_one({'email': email}, {
-            '$set': {'last_activity': current_date},
+            '$set': {'last_activity': current_date, 'summary.last_activity': current_date},
             '$inc': {'login_count': 1}
         })
 
@@ -105,6 +261,45 @@ def do_login():
         flash('Invalid email or password.', 'error')
         return redirect(url_for('login'))
 
+def new_user_doc(name, email, phone, hashed_password):
+    """A new student account, as created by signup and the roster import."""
+    progress = {
+        'Reading': 0,
+        'Mathematics': 0,
+        'Science': 0,
+        'Problem Solving': 0
+    }
+    user_doc = {
+        'name': name,
+        'email': email,
+        'phone': phone,
+        'password': hashed_password,
+        'progress': progress,
+        'grades': {
+            'Reading': 'N/A',
+            'Mathematics': 'N/A',
+            'Science': 'N/A',
+            'Problem Solving': 'N/A'
+        },
+        'time_spent': 0,
+        'completed_works': [],
+        'last_activity': 'Never',
+        'achievements': [],
+        'feedback': [],
+        'login_count': 0,
+    }
+    user_doc['summary'] = build_summary(user_doc)
+    return user_doc
+
+def new_parent_doc(child_name, child_email, hashed_password):
+    # Parents sign in as parent_<child email> with the child's password
+    return {
+        'email': f"parent_{child_email}",
+        'password': hashed_password,
+        'child_email': child_email,
+        'child_name': child_name
+    }
+
 @app.route('/signup', methods=['GET', 'POST'])
 def signup():
     if request.method == 'POST':
@@ -113,45 +308,27 @@ def signup():
         phone = request.form['phone']
         password = request.form['password']
 
-        if users.find_one({'email': email}):
+        if not ip_limiter.allow(f'ip:{request.remote_addr}'):
+            flash('Too many attempts. Please wait a minute and try again.', 'error')
+            return redirect(url_for('signup'))
+
+        if users.find_one({'email': email}, {'_id': 1}):
+            flash('Email already registered!', 'error')
+            return redirect(url_for('signup'))
+
+        try:
+            hashed_password = hasher.hash(password)
+        except HashingBusy:
+            flash('The server is busy. Please try again in a moment.', 'error')
+            return redirect(url_for('signup'))
+        try:
+            users.insert_one(new_user_doc(name, email, phone, hashed_password))
+        except DuplicateKeyError:
+            # Lost a race with a concurrent signup for the same email
             flash('Email already registered!', 'error')
             return redirect(url_for('signup'))
 
-        hashed_password = generate_password_hash(password)
-        user_doc = {
-            'name': name,
-            'email': email,
-            'phone': phone,
-            'password': hashed_password,
-            'progress': {
-                'Reading': 0,
-                'Mathematics': 0,
-                'Science': 0,
-                'Problem Solving': 0
-            },
-            'grades': {
-                'Reading': 'N/A',
-                'Mathematics': 'N/A',
-                'Science': 'N/A',
-                'Problem Solving': 'N/A'
-            },
-            'time_spent': 0,
-            'completed_works': [],
-            'last_activity': 'Never',
-            'achievements': [],
-            'feedback': [],
-            'login_count': 0
-        }
-        users.insert_one(user_doc)
-
-        parent_email = f"parent_{email}"
-        parent_doc = {
-            'email': parent_email,
-            'password': hashed_password,
-            'child_email': email,
-            'child_name': name
-        }
-        parents.insert_one(parent_doc)
+        parents.insert_one(new_parent_doc(name, email, hashed_password))
 
         flash('Account created successfully!', 'success')
         return redirect(url_for('login'))
@@ -159,17 +336,18 @@ def signup():
     return render_template('signup.html')
 
 # -------------------- MAIN PAGES --------------------
+# Pages served through `pages` must not depend on session or flash state.
 @app.route('/home')
 def home():
-    return render_template('home.html')
+    return pages.render('home.html')
 
 @app.route('/pre-primary')
 def pre_primary():
-    return render_template('pre_primary_section.html')
+    return pages.render('pre_primary_section.html')
 
 @app.route('/strokes')
 def strokes():
-    return render_template('strokes.html')
+    return pages.render('strokes.html')
 
 @app.route('/alphabets')
 def alphabets():
@@ -177,23 +355,23 @@ def alphabets():
 
 @app.route('/colors')
 def colors():
-    return render_template('colors.html')
+    return pages.render('colors.html')
 
 @app.route('/animals')
 def animals():
-    return render_template('animals.html')
+    return pages.render('animals.html')
 
 @app.route('/vegetables')
 def vegetables():
-    return render_template('vegetables.html')
+    return pages.render('vegetables.html')
 
 @app.route('/fruits')
 def fruits():
-    return render_template('fruits.html')
+    return pages.render('fruits.html')
 
 @app.route('/numbers')
 def numbers():
-    return render_template('numbers.html')
+    return pages.render('numbers.html')
 
 @app.route('/primary')
 def primary():
@@ -201,81 +379,271 @@ def primary():
 
 @app.route('/primary_section')
 def primary_section():
-    return render_template('primary_section.html')
+    return pages.render('primary_section.html')
 
 @app.route('/history')
 def history():
-    return render_template('history.html')
+    return pages.render('history.html')
+
+# -------------------- QUIZ RESULTS --------------------
+PASS_SCORE = 60  # percent
+QUIZ_POINTS = 5
+
+# Primary-section quiz pages -> progress subject they credit
+PRIMARY_QUIZ_SUBJECTS = {
+    'math': 'Mathematics',
+    'science': 'Science',
+    'gk': 'General Knowledge',
+    'grammar': 'Grammar',
+}
+
+# -------------------- LEADERBOARD + STREAKS --------------------
+# Boards live in memory per worker and are persisted to `leaderboard` every
+# LEADERBOARD_FLUSH_INTERVAL seconds (see leaderboard.py).
+PREPRIMARY_BOARD = 'Pre-Primary'
+LEADERBOARD_SUBJECTS = list(PRIMARY_QUIZ_SUBJECTS.values()) + ['History', PREPRIMARY_BOARD]
+# Each new pre-primary work (a section's first game, video or passed quiz
+# of the day) earns these points, kept in `preprimary_points` on the user
+PREPRIMARY_POINTS = 1
+leaderboard = Leaderboard(
+    store.collection('leaderboard'),
+    subjects=LEADERBOARD_SUBJECTS,
+    flush_interval=float(os.environ.get("LEADERBOARD_FLUSH_INTERVAL", "5")),
+    refresh_interval=float(os.environ.get("LEADERBOARD_REFRESH_INTERVAL", "60")),
+)
+streaks = StreakTracker(users)
+
+# (threshold, achievement) pairs, awarded once when a total first reaches them
+POINT_ACHIEVEMENTS = [
+    (QUIZ_POINTS, 'First Quiz Passed'),
+    (50, '50 Points'),
+    (100, '100 Points'),
+    (250, '250 Points'),
+]
+STREAK_ACHIEVEMENTS = [
+    (3, '3-Day Streak'),
+    (7, '7-Day Streak'),
+    (30, '30-Day Streak'),
+]
+
+def milestones_crossed(rules, before, after):
+    return [name for threshold, name in rules if before < threshold <= after]
+
+def award_achievements(email, names):
+    # Rare (only on crossing a threshold); the $ne guard keeps each
+    # achievement, and its count, from being added twice.
+    for name in names:
+        users.update_one(
+            {'email': email, 'achievements': {'$ne': name}},
+            {'$push': {'achievements': name}, '$inc': {'summary.achievements_count': 1}},
+        )
+
+def record_active_day(email):
+    streak = streaks.touch(email)
+    if streak:
+        award_achievements(email, milestones_crossed(
+            STREAK_ACHIEVEMENTS, streak['current'] - 1, streak['current']))
+
+def dotted(doc, path, default=None):
+    for part in path.split('.'):
+        if not isinstance(doc, dict) or part not in doc:
+            return default
+        doc = doc[part]
+    return doc
+
+def record_quiz_pass(email, subject, work, unlock=None, best=None):
+    """Credit a passed quiz in one atomic write and return the updated fields.
+
+    ``unlock`` is a ``(field, level)`` pair raised with ``$max`` so concurrent
+    submissions can only move it forward; ``best`` likewise keeps the highest
+    ``(field, score)``. Only a pass that raises one of them earns points, so
+    resubmitting a quiz cannot farm the boards and achievements.
+    """
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    update: Dict[str, Any] = {
+        '$inc': {
+            f'progress.{subject}': QUIZ_POINTS,
+            'summary.progress_total': QUIZ_POINTS,
+            'summary.works_count': 1,
+        },
+        '$set': {'summary.last_activity': now},
+        '$push': recent_works_push([work]),
+    }
+    projection = {'_id': 0, 'name': 1, f'progress.{subject}': 1, 'summary.progress_total': 1}
+    query: Dict[str, Any] = {'email': email}
+    pairs = [pair for pair in (unlock, best) if pair]
+    for field, value in pairs:
+        update.setdefault('$max', {})[field] = value
+        projection[field] = 1
+    if pairs:
+        query['$or'] = ([{field: {'$exists': False}} for field, _ in pairs]
+                        + [{field: {'$lt': value}} for field, value in pairs])
+    # Read the pre-image so a first credit in a new subject can be detected;
+    # the post-image follows directly from the $inc/$max applied above.
+    before = users.find_one_and_update(query, update, projection=projection)
+    if before is None:
+        # Unknown student, or no improvement: nothing credited
+        current = users.find_one({'email': email}, projection)
+        if current is None:
+            return None
+        child = {'progress': {subject: (current.get('progress') or {}).get(subject, 0)}}
+        child.update({field: dotted(current, field, 0) for field, _ in pairs})
+        return child
+
+    previous = (before.get('progress') or {}).get(subject)
+    if previous is None:
+        # A partial summary is rebuilt (with the right count) on first view
+        users.update_one({'email': email, 'summary.v': SUMMARY_VERSION},
+                         {'$inc': {'summary.subject_count': 1}})
+    child = {'progress': {subject: (previous or 0) + QUIZ_POINTS}}
+    for pair in (unlock, best):
+        if pair:
+            child[pair[0]] = max(dotted(before, pair[0], pair[1]), pair[1])
+    log_activity(email, [work])
+
+    total = (before.get('summary') or {}).get('progress_total', 0)
+    leaderboard.record(email, before.get('name', 'Student'), QUIZ_POINTS, subject)
+    award_achievements(email, milestones_crossed(POINT_ACHIEVEMENTS, total, total + QUIZ_POINTS))
+    record_active_day(email)
+    return child
+
+# -------------------- QUIZ BANK API --------------------
+# Questions and answer keys live in data/quiz_bank.json, loaded once per worker
+quiz_bank = QuizBank(os.environ.get('QUIZ_BANK_PATH') or os.path.join(app.root_path, 'data', 'quiz_bank.json'))
+QUIZ_SET_MAX_AGE = 3600
+
+def quiz_seed(source):
+    """Read the optional ``seed`` that identifies a quiz set.
+
+    Sets always hold the whole quiz: a client-chosen size would let a
+    one-question submission score 100%.
+    """
+    seed = source.get('seed')
+    return int(seed) if seed not in (None, '') else None
+
+@app.route('/api/quiz/<subject>')
+def api_quiz(subject):
+    if quiz_bank.get(subject) is None:
+        return jsonify({'error': 'unknown subject'}), 404
+    try:
+        seed = quiz_seed(request.args)
+    except ValueError:
+        return jsonify({'error': 'seed must be a number'}), 400
+
+    body, etag = quiz_bank.quiz_set(subject, seed or 0)
+    response = app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    # A seeded set never changes until the bank does (and the ETag with it)
+    response.headers['Cache-Control'] = (
+        f'public, max-age={QUIZ_SET_MAX_AGE}' if seed is not None else 'no-cache')
+    return response.make_conditional(request)
+
+@app.route('/api/quiz/<subject>/grade', methods=['POST'])
+def api_quiz_grade(subject):
+    if quiz_bank.get(subject) is None:
+        return jsonify({'error': 'unknown subject'}), 404
+    payload = request.get_json(silent=True) or {}
+    answers = payload.get('answers')
+    if not isinstance(answers, dict):
+        return jsonify({'error': 'answers must be an object'}), 400
+    try:
+        seed = quiz_seed(payload)
+        video_index = int(payload.get('video_index') or 0)
+    except (TypeError, ValueError):
+        return jsonify({'error': 'seed and video_index must be numbers'}), 400
+
+    email = session.get('child_email') if session.get('child_logged_in') else None
+    if subject == 'history' and email:
+        # Only a video the student has already unlocked can be credited
+        user = users.find_one({'email': email}, {'_id': 0, 'history_progress': 1}) or {}
+        last_video = len(quiz_bank.playlists.get('history', [])) - 1
+        if not 0 <= video_index <= min(user.get('history_progress', 0), last_video):
+            return jsonify({'error': 'video not unlocked'}), 400
+
+    # Per-question results are not returned: they would reveal the answer key
+    result = quiz_bank.grade(subject, answers, seed or 0)
+    passed = result.percent >= PASS_SCORE
+    response = {'score': result.score, 'total': result.total, 'percent': result.percent,
+                'passed': passed}
+
+    if passed and email:
+        if subject == 'history':
+            child = record_quiz_pass(
+                email, 'History', f'History video {video_index} quiz',
+                unlock=('history_progress', video_index + 1),
+            )
+            response['unlocked'] = (child or {}).get('history_progress', 0)
+        elif subject in PRIMARY_QUIZ_SUBJECTS:
+            name = PRIMARY_QUIZ_SUBJECTS[subject]
+            child = record_quiz_pass(
+                email, name, f'{name} quiz passed ({result.score}/{result.total})',
+                best=(f'quiz_scores.{subject}', result.score),
+            )
+            response['progress'] = (child or {}).get('progress', {}).get(name, 0)
+    return jsonify(response)
 
 # -------------------- HISTORY DATA --------------------
 @app.route('/history/data')
 def history_data():
-    playlist = [
-        "o4IsZBynx88",
-        "DxaUKNG-Tks",
-        "hvSl9EJ0m_8",
-        "qzWxZGx3F8A",
-        "1wH3OCFhPNE",
-        "WcTtlB_3V08",
-        "hEp-vWeF904",
-        "c9H5ka7sesQ",
-        "MKqtCib-QNg"
-    ]
+    playlist = quiz_bank.playlists.get('history', [])
     unlocked = 0
 
     if session.get('child_logged_in'):
-        user = users.find_one({'email': session['child_email']})
+        user = users.find_one({'email': session['child_email']}, {'history_progress': 1})
         unlocked = user.get('history_progress', 0) if user else 0
 
     return jsonify({'playlist': playlist, 'unlocked': unlocked})
 
-@app.route('/history/submit_quiz', methods=['POST'])
-def history_submit_quiz():
-    if not request.is_json:
-        return jsonify({'error': 'JSON required'}), 400
-
-    data = request.get_json()
-    video_index = int(data.get('video_index', -1))
-    score = int(data.get('score', 0))
-
-    PASS_SCORE = 60
-
-    child_email = session.get('child_email')
-    user = users.find_one({'email': child_email})
-
-    unlocked = user.get('history_progress', 0) if user else 0
-
-    if score >= PASS_SCORE:
-        if video_index >= unlocked:
-            new_unlocked = video_index + 1
-            users.update_one({'email': child_email}, {'$set': {'history_progress': new_unlocked}})
-            unlocked = new_unlocked
-
-        users.update_one({'email': child_email}, {
-            '$inc': {'progress.History': 5},
-            '$push': {'completed_works': f'History video {video_index} quiz'}
-        })
-
-        return jsonify({'success': True, 'unlocked': unlocked})
-
-    return jsonify({'success': False}), 200
+# -------------------- LEADERBOARD API --------------------
+def leaderboard_board(scope):
+    if scope == 'global':
+        return GLOBAL
+    if scope == 'weekly':
+        return week_board()
+    if scope == 'history':
+        return subject_board('History')
+    if scope == 'preprimary':
+        return subject_board(PREPRIMARY_BOARD)
+    if scope in PRIMARY_QUIZ_SUBJECTS:
+        return subject_board(PRIMARY_QUIZ_SUBJECTS[scope])
+    return None
+
+@app.route('/api/leaderboard/<scope>')
+def api_leaderboard(scope):
+    """Top ``k`` students of a board plus the logged-in child's own rank.
+
+    ``scope`` is ``global``, ``weekly``, ``preprimary`` or a quiz subject
+    (``math``, ...).
+    """
+    board = leaderboard_board(scope)
+    if board is None:
+        return jsonify({'error': 'unknown leaderboard'}), 404
+    try:
+        k = min(max(int(request.args.get('k', 10)), 1), 100)
+    except ValueError:
+        k = 10
+
+    email = session.get('child_email')
+    top = [{'rank': e['rank'], 'name': e['name'], 'score': e['score'], 'you': e['member'] == email}
+           for e in leaderboard.top(board, k)]
+    return jsonify({'board': scope, 'top': top, 'me': leaderboard.rank(board, email) if email else None})
 
 # -------------------- OTHER SUBJECTS --------------------
 @app.route('/math')
 def math():
-    return render_template('math.html')
+    return pages.render('math.html')
 
 @app.route('/science')
 def science():
-    return render_template('science.html')
+    return pages.render('science.html')
 
 @app.route('/gk')
 def gk():
-    return render_template('gk.html')
+    return pages.render('gk.html')
 
 @app.route('/grammar')
 def grammar():
-    return render_template('grammar.html')
+    return pages.render('grammar.html')
 
 @app.route('/quiz')
 def quiz():
@@ -290,26 +658,30 @@ def preprimary_progress_update():
     child_email = session.get('child_email')
     payload = request.get_json(silent=True) or {}
     section = (payload.get('section') or '').strip().lower()
-    if not section:
-        return jsonify({'error': 'section required'}), 400
+    if section not in PREPRIMARY_SECTIONS:
+        return jsonify({'error': 'unknown section'}), 400
 
     now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
 
-    set_ops = {f'preprimary_progress.{section}.last_updated': now}
+    set_ops = {
+        f'preprimary_progress.{section}.last_updated': now,
+        f'summary.sections.{section}.last_updated': now,
+        'summary.last_activity': now,
+    }
     inc_ops: Dict[str, int] = {}
     max_ops: Dict[str, int] = {}
-    add_to_set: Dict[str, Any] = {}
+    works = []
 
     if payload.get('video_watched'):
         set_ops[f'preprimary_progress.{section}.video_watched'] = True
-        add_to_set['completed_works'] = {'$each': [f'Pre-Primary {section.title()} video watched']}
+        set_ops[f'summary.sections.{section}.video_watched'] = True
+        works.append(f'Pre-Primary {section.title()} video watched')
 
     inc = int(payload.get('inc_games', 0) or 0)
     if inc:
         inc_ops[f'preprimary_progress.{section}.games_played'] = inc
-        add_to_set.setdefault('completed_works', {'$each': []})['$each'].append(
-            f'Pre-Primary {section.title()} game played'
-        )
+        inc_ops[f'summary.sections.{section}.games_played'] = inc
+        works.append(f'Pre-Primary {section.title()} game played')
 
     if 'quiz_score' in payload:
         try:
@@ -317,23 +689,95 @@ def preprimary_progress_update():
         except Exception:
             score = 0
         max_ops[f'preprimary_progress.{section}.quiz_score'] = score
+        max_ops[f'summary.sections.{section}.quiz_score'] = score
         if score >= 3:
-            add_to_set.setdefault('completed_works', {'$each': []})['$each'].append(
-                f'Pre-Primary {section.title()} quiz passed ({score}/4)'
-            )
+            works.append(f'Pre-Primary {section.title()} quiz passed ({score}/4)')
+
+    # Pre-primary events are frequent and the dashboard shows them through
+    # the per-section status, so they go to the activity log only rather
+    # than crowding primary work out of the recent `completed_works` slice.
+    works = unlogged_today(child_email, works) if works else works
+    if works:
+        inc_ops['summary.works_count'] = len(works)
+        inc_ops['preprimary_points'] = PREPRIMARY_POINTS * len(works)
 
     update_doc: Dict[str, Any] = {'$set': set_ops}
     if inc_ops:
         update_doc['$inc'] = inc_ops
     if max_ops:
         update_doc['$max'] = max_ops
-    if add_to_set:
-        update_doc['$addToSet'] = add_to_set
 
-    users.update_one({'email': child_email}, update_doc)
+    update_progress(child_email, update_doc)
+    if works:
+        log_activity(child_email, works)
+        leaderboard.record(child_email, session.get('child_name', 'Student'),
+                           PREPRIMARY_POINTS * len(works), PREPRIMARY_BOARD)
+        record_active_day(child_email)
     return jsonify({'ok': True})
 
+# -------------------- HEARTBEAT TIME TRACKING --------------------
+# Student pages post /heartbeat every HEARTBEAT_INTERVAL seconds while they
+# are visible (static/js/heartbeat.js); each ping credits one interval. Pings
+# are summed in memory and flushed every HEARTBEAT_FLUSH_INTERVAL seconds as
+# one $inc upsert per student/day/subject in `time_daily`, plus one $inc of
+# the student's running total.
+HEARTBEAT_INTERVAL = int(os.environ.get("HEARTBEAT_INTERVAL", "30"))
+HEARTBEAT_SUBJECTS = (set(PRIMARY_QUIZ_SUBJECTS) | set(PREPRIMARY_SECTIONS)
+                      | {'history', 'alphabets', 'general'})
+app.jinja_env.globals['HEARTBEAT_INTERVAL'] = HEARTBEAT_INTERVAL
+
+time_daily = store.collection('time_daily')
+store.add_index('time_daily', [('email', 1), ('day', 1), ('subject', 1)], unique=True)
+_heartbeat_flush = float(os.environ.get("HEARTBEAT_FLUSH_INTERVAL", "60"))
+time_writes = WriteBehindBuffer(time_daily, max_staleness=_heartbeat_flush, max_pending=5000)
+time_totals = WriteBehindBuffer(users, max_staleness=_heartbeat_flush, max_pending=5000)
+# Two tabs, a reload or a fast client can't claim more than one interval
+# per interval (per worker).
+heartbeat_limiter = TokenBucketLimiter(burst=2, per_minute=60.0 / HEARTBEAT_INTERVAL)
+
+def record_time(email, subject, seconds):
+    day = datetime.now().strftime('%Y-%m-%d')
+    time_writes.add({'email': email, 'day': day, 'subject': subject},
+                    {'$inc': {'seconds': seconds}}, upsert=True)
+    minutes = seconds / 60
+    time_totals.add({'email': email}, {'$inc': {'time_spent': minutes, 'summary.time_spent': minutes}})
+
+@app.route('/heartbeat', methods=['POST'])
+def heartbeat():
+    if not session.get('child_logged_in'):
+        return jsonify({'error': 'not logged in'}), 401
+    email = session['child_email']
+    if not heartbeat_limiter.allow(email):
+        return jsonify({'error': 'too many heartbeats'}), 429
+
+    payload = request.get_json(silent=True) or {}
+    subject = str(payload.get('subject') or 'general').strip().lower()
+    if subject not in HEARTBEAT_SUBJECTS:
+        subject = 'general'
+    record_time(email, subject, HEARTBEAT_INTERVAL)
+    return '', 204
+
+def recent_minutes(email, days=7):
+    """Minutes per subject over the last ``days`` days (today included)."""
+    since = (datetime.now() - timedelta(days=days - 1)).strftime('%Y-%m-%d')
+    totals: Dict[str, float] = {}
+    for bucket in time_daily.find({'email': email, 'day': {'$gte': since}},
+                                  {'_id': 0, 'subject': 1, 'seconds': 1}):
+        totals[bucket['subject']] = totals.get(bucket['subject'], 0) + bucket.get('seconds', 0) / 60
+    return totals
+
 # -------------------- PARENT AREA --------------------
+# Everything parent_dashboard.html renders, and nothing else (no password hash)
+DASHBOARD_FIELDS = {
+    '_id': 0, 'name': 1, 'summary': 1, 'progress': 1, 'grades': 1,
+    'completed_works': 1, 'achievements': 1, 'feedback': 1, 'streak': 1,
+}
+# Extra fields needed only to build a missing summary on first view
+SUMMARY_SOURCE_FIELDS = {
+    '_id': 0, 'progress': 1, 'preprimary_progress': 1, 'completed_works': 1, 'works_count': 1,
+    'achievements': 1, 'time_spent': 1, 'last_activity': 1,
+}
+
 @app.route('/parent_login', methods=['GET', 'POST'])
 def parent_login():
     if session.get('parent_logged_in'):
@@ -342,9 +786,20 @@ def parent_login():
     if request.method == 'POST':
         email = request.form.get('email', '').strip()
         password = request.form.get('password', '')
-        parent = parents.find_one({'email': email})
+        if not login_allowed(email):
+            return render_template('parent_login.html',
+                                   error='Too many login attempts. Please wait a minute and try again.'), 429
 
-        if parent and check_password_hash(parent['password'], password):
+        parent = parents.find_one({'email': email})
+        try:
+            ok, rehash = hasher.verify(parent['password'], password) if parent else (False, False)
+        except HashingBusy:
+            return render_template('parent_login.html',
+                                   error='The server is busy. Please try again in a moment.'), 503
+
+        if ok:
+            if rehash:
+                upgrade_hash(parents, parent['_id'], password)
             session['parent_logged_in'] = True
             session['parent_email'] = email
             session['child_email'] = parent['child_email']
@@ -361,19 +816,34 @@ def parent_dashboard():
         return redirect(url_for('parent_login'))
 
     child_email = session.get('child_email')
-    child = users.find_one({'email': child_email})
+    child = users.find_one({'email': child_email}, DASHBOARD_FIELDS)
 
     if child:
+        summary = child.get('summary') or {}
+        if summary.get('v') != SUMMARY_VERSION:
+            # Not backfilled yet (see `flask rebuild-summaries`); progress
+            # writes may already have created a partial one. Build it once.
+            source = users.find_one({'email': child_email}, SUMMARY_SOURCE_FIELDS) or {}
+            summary = build_summary(source, logged_works_count(child_email))
+            users.update_one(
+                {'email': child_email, 'summary.v': {'$ne': SUMMARY_VERSION}},
+                {'$set': {'summary': summary}},
+            )
+
         # Provide safe defaults for optional fields to avoid 500s in template
         context = dict(child)
+        context['summary'] = summary
+        week = recent_minutes(child_email)
+        context['week_minutes'] = sum(week.values())
+        context['week_subjects'] = sorted(week.items(), key=lambda kv: -kv[1])[:3]
+        context['sections'] = PREPRIMARY_SECTIONS
         context['progress'] = child.get('progress', {})
         context['grades'] = child.get('grades', {})
-        context['preprimary_progress'] = child.get('preprimary_progress', {})
         context['completed_works'] = child.get('completed_works', [])
         context['achievements'] = child.get('achievements', [])
+        context['streak'] = child.get('streak', {})
+        context['weekly_rank'] = leaderboard.rank(week_board(), child_email)
         context['feedback'] = child.get('feedback', [])
-        context['time_spent'] = child.get('time_spent', 0)
-        context['last_activity'] = child.get('last_activity', 'Never')
         # Name/email for header display
         context['child_name'] = child.get('name') or session.get('child_name', 'Student')
         context['child_email'] = child_email
@@ -381,6 +851,38 @@ def parent_dashboard():
 
     return "Child data not found"
 
+@app.route('/parent/activity')
+def parent_activity():
+    """Older activity for the logged-in parent's child, newest day first.
+
+    Pages are whole days: ``?before=YYYY-MM-DD`` returns up to ``days`` days
+    of activity older than that date plus the cursor for the next page.
+    """
+    if not session.get('parent_logged_in'):
+        return jsonify({'error': 'not logged in'}), 401
+
+    before = request.args.get('before') or '9999-12-31'
+    try:
+        max_days = min(max(int(request.args.get('days', 7)), 1), 31)
+    except ValueError:
+        max_days = 7
+
+    buckets = activity.find(
+        {'email': session.get('child_email'), 'day': {'$lt': before}},
+        {'_id': 0, 'day': 1, 'items': 1},
+    ).sort([('day', -1), ('_id', -1)])
+
+    items, days, next_before = [], [], None
+    for bucket in buckets:
+        if bucket['day'] not in days:
+            if len(days) == max_days:
+                next_before = days[-1]
+                break
+            days.append(bucket['day'])
+        items.extend(reversed(bucket.get('items', [])))
+
+    return jsonify({'items': items, 'next_before': next_before})
+
 @app.route('/parent_logout')
 def parent_logout():
     session.clear()
@@ -389,18 +891,200 @@ def parent_logout():
 # -------------------- LOGOUT --------------------
 @app.route('/logout')
 def logout():
-    if session.get('child_logged_in'):
-        logout_time = datetime.now()
-        login_time = datetime.strptime(session['login_time'], '%Y-%m-%d %H:%M:%S')
-        minutes = int((logout_time - login_time).total_seconds() / 60)
-
-        users.update_one({'email': session['child_email']}, {
-            '$inc': {'time_spent': minutes}
-        })
-
+    # Time is credited by heartbeats while pages are open (see /heartbeat)
     session.clear()
     return redirect(url_for('login'))
 
+# -------------------- MAINTENANCE COMMANDS --------------------
+@app.cli.command('migrate-activity')
+def migrate_activity():
+    """Move unbounded completed_works arrays into the activity collection."""
+    moved = 0
+    cursor = users.find(
+        {'$or': [
+            {'summary.v': {'$ne': SUMMARY_VERSION}},
+            {f'completed_works.{RECENT_WORKS_LIMIT}': {'$exists': True}},
+        ]},
+        {'email': 1, 'completed_works': 1},
+    ).batch_size(500)
+    for user in cursor:
+        works = user.get('completed_works', [])
+        if activity.find_one({'email': user['email'], 'day': LEGACY_ACTIVITY_DAY}, {'_id': 1}):
+            continue  # already migrated
+        for start in range(0, len(works), ACTIVITY_BUCKET_SIZE):
+            chunk = works[start:start + ACTIVITY_BUCKET_SIZE]
+            activity.insert_one({
+                'email': user['email'],
+                'day': LEGACY_ACTIVITY_DAY,
+                'count': len(chunk),
+                'items': [{'work': w, 'at': None} for w in chunk],
+            })
+        users.update_one({'_id': user['_id']}, {'$push': recent_works_push([])})
+        moved += 1
+    print(f"Migrated activity for {moved} users. Run `flask rebuild-summaries` next.")
+
+@app.cli.command('rebuild-summaries')
+def rebuild_summaries():
+    """Recompute every user's dashboard summary from their full document."""
+    batch, rebuilt = [], 0
+    cursor = users.find({}, dict(SUMMARY_SOURCE_FIELDS, _id=1, email=1)).batch_size(500)
+    for user in cursor:
+        summary = build_summary(user, logged_works_count(user.get('email')))
+        batch.append(UpdateOne({'_id': user['_id']}, {'$set': {'summary': summary}}))
+        if len(batch) >= 500:
+            users.bulk_write(batch, ordered=False)
+            rebuilt += len(batch)
+            batch = []
+    if batch:
+        users.bulk_write(batch, ordered=False)
+        rebuilt += len(batch)
+    print(f"Rebuilt summaries for {rebuilt} users.")
+
+@app.cli.command('rebuild-leaderboard')
+def rebuild_leaderboard():
+    """Recompute the global and per-subject boards from users' points.
+
+    Weekly boards cannot be rebuilt (points are not timestamped) and fill
+    up again as students earn points.
+    """
+    batch, written = [], 0
+    cursor = users.find({'$or': [{'progress': {'$exists': True}}, {'preprimary_points': {'$exists': True}}]},
+                        {'_id': 0, 'email': 1, 'name': 1, 'progress': 1, 'preprimary_points': 1}).batch_size(500)
+    for user in cursor:
+        progress = dict(user.get('progress') or {})
+        if user.get('preprimary_points'):
+            progress[PREPRIMARY_BOARD] = user['preprimary_points']
+        scores = {GLOBAL: sum(v or 0 for v in progress.values())}
+        scores.update({subject_board(s): v for s, v in progress.items() if v})
+        for board, score in scores.items():
+            batch.append(UpdateOne(
+                {'board': board, 'member': user['email']},
+                {'$set': {'score': score, 'name': user.get('name', 'Student')}},
+                upsert=True,
+            ))
+        if len(batch) >= 500:
+            leaderboard.collection.bulk_write(batch, ordered=False)
+            written += len(batch)
+            batch = []
+    if batch:
+        leaderboard.collection.bulk_write(batch, ordered=False)
+        written += len(batch)
+    print(f"Wrote {written} leaderboard entries. Running workers pick them up within "
+          f"LEADERBOARD_REFRESH_INTERVAL seconds.")
+
+# -------------------- ROSTER IMPORT / EXPORT --------------------
+ALLOW_MEMORY_OPTION = click.option(
+    '--allow-memory', is_flag=True,
+    help='Run even if MongoDB is unreachable and the in-memory fallback is in use.')
+
+def require_database(allow_memory):
+    """Abort unless MongoDB is up, or fallback data is kept (MEMSTORE_SNAPSHOT)."""
+    store.database()
+    if store.mode == MODE_MONGO or allow_memory or store.snapshot_path:
+        return
+    raise click.ClickException(
+        'MongoDB is unreachable and the in-memory fallback would be used, which is '
+        'lost when this command exits. Check MONGO_URI, or pass --allow-memory.')
+
+def insert_ignoring_duplicates(collection, docs):
+    """insert_many(ordered=False); return the indexes rejected as duplicates."""
+    try:
+        collection.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        errors = e.details.get('writeErrors', [])
+        others = [err for err in errors if err.get('code') != 11000]
+        if others:
+            raise
+        return {err['index'] for err in errors}
+    return set()
+
+@app.cli.command('import-roster')
+@click.argument('path')
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), help='Default: from the file extension.')
+@click.option('--batch-size', default=500, show_default=True)
+@click.option('--workers', default=os.cpu_count() or 1, show_default=True, help='Hashing processes.')
+@click.option('--report', type=click.Path(dir_okay=False), help='Write skipped rows here as JSONL.')
+@ALLOW_MEMORY_OPTION
+def import_roster(path, fmt, batch_size, workers, report, allow_memory):
+    """Create student and parent accounts from a CSV/JSONL roster ("-" = stdin).
+
+    Columns: name, email, password and optionally phone. Rows with an email
+    that is already registered (or repeated in the file) are skipped and
+    reported; the rest are imported.
+    """
+    fmt = roster.detect_format(path, fmt) if path != '-' else (fmt or 'csv')
+    require_database(allow_memory)
+    bulk_hasher = PasswordHasher(method=hasher.method, workers=workers)
+    created, skipped = 0, []
+
+    with click.open_file(path, 'r', encoding='utf-8-sig') as stream:
+        for batch in roster.batched(roster.read_rows(stream, fmt), batch_size):
+            students, seen = [], set()
+            for line, row in batch:
+                student, reason = roster.clean_row(row)
+                if student and student['email'] in seen:
+                    student, reason = None, 'duplicate in file'
+                if student is None:
+                    email = row.get('email') if isinstance(row, dict) else None
+                    skipped.append({'line': line, 'email': email, 'reason': reason})
+                    continue
+                seen.add(student['email'])
+                students.append((line, student))
+
+            # Skip existing accounts before paying for their hashes
+            existing = {u['email'] for u in users.find({'email': {'$in': list(seen)}}, {'_id': 0, 'email': 1})}
+            for line, student in students:
+                if student['email'] in existing:
+                    skipped.append({'line': line, 'email': student['email'], 'reason': 'already registered'})
+            students = [(line, st) for line, st in students if st['email'] not in existing]
+            if not students:
+                continue
+
+            hashes = bulk_hasher.hash_many([st['password'] for _, st in students])
+            user_docs = [new_user_doc(st['name'], st['email'], st['phone'], h)
+                         for (_, st), h in zip(students, hashes)]
+            rejected = insert_ignoring_duplicates(users, user_docs)
+            for i in sorted(rejected):
+                skipped.append({'line': students[i][0], 'email': students[i][1]['email'],
+                                'reason': 'already registered'})
+            parent_docs = [new_parent_doc(doc['name'], doc['email'], doc['password'])
+                           for i, doc in enumerate(user_docs) if i not in rejected]
+            if parent_docs:
+                for i in insert_ignoring_duplicates(parents, parent_docs):
+                    print(f"Parent account {parent_docs[i]['email']} already existed; left unchanged.")
+            created += len(parent_docs)
+            print(f"Imported {created} students so far...")
+
+    print(f"Imported {created} students; skipped {len(skipped)} rows.")
+    if report:
+        with open(report, 'w', encoding='utf-8') as fh:
+            for item in skipped:
+                fh.write(json.dumps(item) + '\n')
+        print(f"Skipped rows written to {report}.")
+    else:
+        for item in skipped[:20]:
+            print(f"  line {item['line']}: {item['email'] or '?'} ({item['reason']})")
+        if len(skipped) > 20:
+            print(f"  ... and {len(skipped) - 20} more (use --report to save them all)")
+
+@app.cli.command('export-progress')
+@click.argument('path', default='-')
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), help='Default: from the file extension, else jsonl.')
+@click.option('--batch-size', default=1000, show_default=True)
+@ALLOW_MEMORY_OPTION
+def export_progress(path, fmt, batch_size, allow_memory):
+    """Stream every student's progress to a CSV/JSONL file ("-" = stdout)."""
+    if not fmt:
+        fmt = 'csv' if path.lower().endswith('.csv') else 'jsonl'
+    require_database(allow_memory)
+    cursor = users.find({}, roster.EXPORT_FIELDS).batch_size(batch_size)
+    with click.open_file(path, 'w', encoding='utf-8') as out:
+        count = roster.write_progress(cursor, out, fmt)
+    if path != '-':
+        print(f"Exported {count} students to {path}.")
+    else:
+        print(f"Exported {count} students.", file=sys.stderr)
+
 # -------------------- RUN FLASK --------------------
 if __name__ == '__main__':
     app.run(port=5000, host='0.0.0.0')
@@ -0,0 +1,151 @@
+"""Fingerprinted, long-cached static files.
+
+``url_for('static', filename=...)`` gains a ``?v=<content hash>`` parameter,
+and requests carrying the current hash are served with an immutable,
+year-long ``Cache-Control``, so the videos and images are downloaded once per
+browser. Text assets can be precompressed to ``.gz``/``.br`` siblings by the
+``flask build-assets`` command; byte ranges, ETags and 304s come from
+Werkzeug's conditional ``send_file``.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import threading
+from typing import Dict, Optional
+
+from flask import Flask, abort, request, send_file
+from werkzeug.security import safe_join
+
+try:
+    import brotli  # optional: pip install brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+MANIFEST_NAME = 'manifest.json'
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.txt')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+# Without a matching fingerprint, browsers revalidate with the ETag
+REVALIDATE = 'public, max-age=0, must-revalidate'
+
+
+def _digest(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()[:12]
+
+
+def _is_source(name: str) -> bool:
+    return not name.startswith('.') and name != MANIFEST_NAME and not name.endswith(('.gz', '.br'))
+
+
+def build(static_dir: str, compress: bool = True) -> Dict[str, Dict[str, object]]:
+    """Hash every file under ``static_dir``, write the manifest and
+    precompressed variants, and return the manifest."""
+    manifest: Dict[str, Dict[str, object]] = {}
+    for root, dirs, files in os.walk(static_dir):
+        dirs[:] = [d for d in dirs if not d.startswith('.')]
+        for name in files:
+            if not _is_source(name):
+                continue
+            path = os.path.join(root, name)
+            rel = os.path.relpath(path, static_dir).replace(os.sep, '/')
+            st = os.stat(path)
+            manifest[rel] = {'hash': _digest(path), 'size': st.st_size, 'mtime': int(st.st_mtime)}
+            if compress and name.lower().endswith(COMPRESSIBLE):
+                with open(path, 'rb') as fh:
+                    data = fh.read()
+                with open(path + '.gz', 'wb') as fh:
+                    fh.write(gzip.compress(data, 9, mtime=0))
+                if brotli is not None:
+                    with open(path + '.br', 'wb') as fh:
+                        fh.write(brotli.compress(data, quality=11))
+    with open(os.path.join(static_dir, MANIFEST_NAME), 'w', encoding='utf-8') as fh:
+        json.dump(manifest, fh, indent=0, sort_keys=True)
+    return manifest
+
+
+class StaticAssets:
+    def __init__(self, app: Optional[Flask] = None):
+        self.static_dir = ''
+        self._manifest: Dict[str, Dict[str, object]] = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        self.static_dir = app.static_folder
+        path = os.path.join(self.static_dir, MANIFEST_NAME)
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as fh:
+                self._manifest = json.load(fh)
+        app.url_defaults(self._add_version)
+        app.view_functions['static'] = self.serve
+
+        @app.cli.command('build-assets')
+        def build_assets():
+            """Fingerprint static files and write .gz/.br variants."""
+            manifest = build(self.static_dir)
+            print(f"Fingerprinted {len(manifest)} static files"
+                  + ('' if brotli else ' (brotli not installed: gzip only)') + '.')
+
+    def version(self, filename: str) -> Optional[str]:
+        path = safe_join(self.static_dir, filename)
+        if path is None:
+            return None
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        entry = self._manifest.get(filename)
+        if entry and entry['size'] == st.st_size and entry['mtime'] == int(st.st_mtime):
+            return entry['hash']
+        # Missing or stale manifest entry: hash once and remember it
+        entry = {'hash': _digest(path), 'size': st.st_size, 'mtime': int(st.st_mtime)}
+        with self._lock:
+            self._manifest[filename] = entry
+        return entry['hash']
+
+    def _add_version(self, endpoint: str, values: Dict[str, object]) -> None:
+        if endpoint == 'static' and 'v' not in values and 'filename' in values:
+            version = self.version(str(values['filename']))
+            if version:
+                values['v'] = version
+
+    def serve(self, filename: str):
+        path = safe_join(self.static_dir, filename)
+        if path is None or not os.path.isfile(path):
+            abort(404)
+        version = self.version(filename)
+        fingerprinted = version is not None and request.args.get('v') == version
+
+        send_path, encoding = path, None
+        if filename.lower().endswith(COMPRESSIBLE):
+            accepted = request.accept_encodings
+            for enc, ext in (('br', '.br'), ('gzip', '.gz')):
+                candidate = path + ext
+                if accepted[enc] and os.path.isfile(candidate) \
+                        and os.path.getmtime(candidate) >= os.path.getmtime(path):
+                    send_path, encoding = candidate, enc
+                    break
+
+        response = send_file(
+            send_path,
+            mimetype=mimetypes.guess_type(filename)[0] if encoding else None,
+            download_name=os.path.basename(filename),
+            conditional=True,
+            etag=(f'{version}-{encoding}' if encoding else version) or True,
+            max_age=None,
+        )
+        response.headers['Cache-Control'] = IMMUTABLE if fingerprinted else REVALIDATE
+        if filename.lower().endswith(COMPRESSIBLE):
+            response.vary.add('Accept-Encoding')
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        else:
+            response.headers['Accept-Ranges'] = 'bytes'
+        return response
+
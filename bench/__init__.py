@@ -0,0 +1 @@
+"""Benchmark harness; see bench/run.py."""
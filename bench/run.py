@@ -0,0 +1,388 @@
+"""Replay classroom traffic against the app and report per-route latency.
+
+Run from the repository root::
+
+    python -m bench.run classroom                    # in-process, in-memory store
+    python -m bench.run game-ticks --mongo mongodb://localhost:27017/
+    python -m bench.run dashboard --gunicorn --workers 4 --mongo mongodb://localhost:27017/
+    python -m bench.run dashboard --gunicorn --workers 1 --threads 16
+    python -m bench.run quiz --url http://127.0.0.1:8000   # a server you started
+    python -m bench.run --compare old.json new.json
+
+Each virtual user is one thread with its own session (student or parent),
+signed up and logged in before timing starts. Users pick actions from the
+scenario's weighted mix with a seeded RNG, so a run is repeatable. Results
+(count, errors, throughput, p50/p95/p99 per route, plus the commit and
+settings) are written as sorted JSON to ``bench/results/<scenario>.json``
+unless ``--out`` says otherwise.
+
+The in-memory store is used unless ``--mongo`` is given; point that at a
+throwaway instance, since benchmark users are left behind. The in-memory
+store lives inside one process, so ``--gunicorn`` with more than one worker
+needs ``--mongo``. Login throttling
+is lifted for the run so bursts measure hashing, not the rate limiter.
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from typing import Any, Dict, List, Optional, Tuple
+
+from bench.scenarios import SCENARIOS, game_tick, section_quiz, take_quiz, video_watched
+
+PASSWORD = 'bench-pass-123'
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+BENCH_ENV = {
+    'SECRET_KEY': 'bench-secret',  # shared by every gunicorn worker
+    'LOGIN_IP_BURST': '1000000',
+    'LOGIN_IP_PER_MINUTE': '1000000',
+    'LOGIN_EMAIL_BURST': '1000',
+    'LOGIN_EMAIL_PER_MINUTE': '1000',
+    'MONGO_HEALTH_INTERVAL': '0',
+}
+# Nothing listens on the discard port, so the app falls back immediately
+MEMORY_ENV = {'MONGO_URI': 'mongodb://127.0.0.1:9/', 'MONGO_STARTUP_TIMEOUT': '0.05'}
+# Where the app sends a request whose session it does not recognise
+LOGIN_PAGES = ('/', '/parent_login')
+
+
+# -------------------- SESSIONS --------------------
+class Recorder:
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.enabled = False
+        self._lock = threading.Lock()
+
+    def add(self, label: str, seconds: float, ok: bool) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self.samples.setdefault(label, []).append(seconds)
+            if not ok:
+                self.errors[label] = self.errors.get(label, 0) + 1
+
+
+class BaseSession:
+    def __init__(self, recorder: Recorder, role: str, email: str):
+        self.recorder = recorder
+        self.role = role
+        self.email = email
+
+    def _send(self, method: str, path: str, form: Optional[Dict[str, str]],
+              json_body: Any) -> Tuple[int, str, bytes]:
+        """Return the status, the Location header ('' if none) and the body."""
+        raise NotImplementedError
+
+    def request(self, label: str, method: str, path: str, form: Optional[Dict[str, str]] = None,
+                json: Any = None, logs_out: bool = False) -> Tuple[int, bytes]:
+        """Send one timed request.
+
+        A redirect to a login page means the session was lost, so it counts as
+        an error unless ``logs_out`` says that is where the request should go.
+        """
+        start = time.perf_counter()
+        status, location, body = self._send(method, path, form, json)
+        ok = 0 < status < 400
+        if ok and not logs_out and urllib.parse.urlsplit(location).path in LOGIN_PAGES:
+            ok = False
+        self.recorder.add(label, time.perf_counter() - start, ok)
+        return status, body
+
+    def signup(self) -> None:
+        # Success redirects to the login page
+        self.request('POST /signup', 'POST', '/signup', form={
+            'name': self.email.split('@')[0], 'email': self.email, 'phone': '0000000000',
+            'password': PASSWORD, 'confirm_password': PASSWORD,
+        }, logs_out=True)
+
+    def login(self) -> None:
+        if self.role == 'parent':
+            self.request('POST /parent_login', 'POST', '/parent_login',
+                         form={'email': f'parent_{self.email}', 'password': PASSWORD})
+        else:
+            self.request('POST /login', 'POST', '/login', form={'email': self.email, 'password': PASSWORD})
+
+
+class TestClientSession(BaseSession):
+    def __init__(self, app, *args):
+        super().__init__(*args)
+        self.client = app.test_client()
+
+    def _send(self, method, path, form, json_body):
+        resp = self.client.open(path, method=method, data=form, json=json_body)
+        return resp.status_code, resp.headers.get('Location', ''), resp.get_data()
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None  # report the 302 itself, like the test client does
+
+
+class HttpSession(BaseSession):
+    def __init__(self, base_url: str, *args):
+        super().__init__(*args)
+        self.base_url = base_url.rstrip('/')
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _NoRedirect())
+
+    def _send(self, method, path, form, json_body):
+        data, headers = None, {}
+        if json_body is not None:
+            data, headers = json.dumps(json_body).encode(), {'Content-Type': 'application/json'}
+        elif form is not None:
+            data = urllib.parse.urlencode(form).encode()
+        req = urllib.request.Request(self.base_url + path, data=data, headers=headers, method=method)
+        try:
+            with self.opener.open(req, timeout=30) as resp:
+                return resp.status, resp.headers.get('Location', ''), resp.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.headers.get('Location', ''), e.read()
+        except OSError:
+            return 0, '', b''
+
+
+# -------------------- RUNNING --------------------
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(pct / 100.0 * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(samples: List[float], errors: int, wall: float) -> Dict[str, Any]:
+    values = sorted(samples)
+    ms = lambda v: round(v * 1000, 3)
+    return {
+        'count': len(values),
+        'errors': errors,
+        'throughput_rps': round(len(values) / wall, 2) if wall else 0.0,
+        'mean_ms': ms(sum(values) / len(values)) if values else 0.0,
+        'p50_ms': ms(percentile(values, 50)),
+        'p95_ms': ms(percentile(values, 95)),
+        'p99_ms': ms(percentile(values, 99)),
+        'max_ms': ms(values[-1]) if values else 0.0,
+    }
+
+
+def run(scenario_name: str, make_session, users: int, iterations: int, warmup: int,
+        seed: int) -> Dict[str, Any]:
+    scenario = SCENARIOS[scenario_name]
+    recorder = Recorder()
+    run_id = f'{int(time.time())}-{random.Random(seed).randrange(1 << 30)}'
+    parents = int(round(users * scenario.parent_share))
+    students = users - parents
+    emails = [f'bench-{run_id}-{i}@example.com' for i in range(users)]
+    # Parents watch the simulated students' accounts when there are any
+    sessions = ([make_session(recorder, 'parent', emails[parents + i % students] if students else emails[i])
+                 for i in range(parents)]
+                + [make_session(recorder, 'student', emails[parents + i]) for i in range(students)])
+
+    # Setup (untimed): accounts and logins. Parents without a simulated
+    # student give their child some history first so the dashboard has data.
+    def prepare_student(s):
+        s.signup()
+        s.login()
+
+    def prepare_parent(s):
+        if not students:
+            child = make_session(recorder, 'student', s.email)
+            prepare_student(child)
+            rng = random.Random(seed)
+            for action in (game_tick, video_watched, section_quiz, take_quiz) * 5:
+                action(child, rng)
+        s.login()
+    _in_threads(sessions[parents:], prepare_student)
+    _in_threads(sessions[:parents], prepare_parent)
+
+    start_gate = threading.Barrier(users + 1)
+
+    def drive(s, index):
+        rng = random.Random(seed * 1000003 + index)
+        try:
+            for _ in range(warmup):
+                scenario.pick(s.role, rng)(s, rng)
+        except Exception:
+            start_gate.abort()
+            raise
+        start_gate.wait()
+        for _ in range(iterations):
+            scenario.pick(s.role, rng)(s, rng)
+
+    threads = [threading.Thread(target=drive, args=(s, i)) for i, s in enumerate(sessions)]
+    for t in threads:
+        t.start()
+    start_gate.wait()  # every user is warmed up and released at once
+    recorder.enabled = True
+    began = time.perf_counter()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - began
+    recorder.enabled = False
+
+    routes = {label: summarize(values, recorder.errors.get(label, 0), wall)
+              for label, values in recorder.samples.items()}
+    everything = [v for values in recorder.samples.values() for v in values]
+    return {
+        'routes': routes,
+        'total': summarize(everything, sum(recorder.errors.values()), wall),
+        'wall_seconds': round(wall, 3),
+    }
+
+
+def _in_threads(sessions, fn) -> None:
+    threads = [threading.Thread(target=fn, args=(s,)) for s in sessions]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _wait_for_port(port: int, timeout: float = 20.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'gunicorn did not start listening on port {port}')
+
+
+# -------------------- REPORTING --------------------
+def print_report(result: Dict[str, Any]) -> None:
+    print(f"{'route':40} {'count':>7} {'err':>5} {'rps':>9} {'p50':>9} {'p95':>9} {'p99':>9}")
+    rows = sorted(result['routes'].items()) + [('TOTAL', result['total'])]
+    for label, r in rows:
+        print(f"{label:40} {r['count']:>7} {r['errors']:>5} {r['throughput_rps']:>9.1f} "
+              f"{r['p50_ms']:>8.2f}ms {r['p95_ms']:>7.2f}ms {r['p99_ms']:>7.2f}ms")
+
+
+def compare(old_path: str, new_path: str) -> None:
+    with open(old_path, encoding='utf-8') as fh:
+        old = json.load(fh)
+    with open(new_path, encoding='utf-8') as fh:
+        new = json.load(fh)
+    print(f"{old['meta']['commit']} -> {new['meta']['commit']} ({new['meta']['scenario']})")
+    print(f"{'route':40} {'rps':>16} {'p50':>16} {'p95':>16} {'p99':>16}")
+
+    def delta(a: float, b: float) -> str:
+        return f'{b:>8.1f} {((b - a) / a * 100) if a else 0:+6.1f}%'
+
+    labels = sorted(set(old['routes']) | set(new['routes']))
+    for label in labels + ['TOTAL']:
+        a = old['total'] if label == 'TOTAL' else old['routes'].get(label)
+        b = new['total'] if label == 'TOTAL' else new['routes'].get(label)
+        if a is None or b is None:
+            print(f"{label:40} {'only in ' + (new_path if a is None else old_path)}")
+            continue
+        print(f"{label:40} " + ' '.join(delta(a[k], b[k]) for k in
+                                        ('throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms')))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('scenario', nargs='?', choices=sorted(SCENARIOS))
+    parser.add_argument('--users', type=int, default=20, help='concurrent virtual users (default 20)')
+    parser.add_argument('--iterations', type=int, default=50, help='timed actions per user (default 50)')
+    parser.add_argument('--warmup', type=int, default=3, help='untimed actions per user first (default 3)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--mongo', metavar='URI', help='use this MongoDB instead of the in-memory store')
+    parser.add_argument('--url', help='benchmark an already running server instead of the test client')
+    parser.add_argument('--gunicorn', action='store_true', help='start a local gunicorn for the run')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='gunicorn workers with --gunicorn (more than 1 needs --mongo)')
+    parser.add_argument('--threads', type=int, help='threads per gunicorn worker (default: gunicorn.conf.py)')
+    parser.add_argument('--out', help='result file (default bench/results/<scenario>.json)')
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help='diff two result files')
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return 0
+    if not args.scenario:
+        parser.error('a scenario is required')
+    if args.gunicorn and args.workers > 1 and not args.mongo:
+        # Each worker would have its own in-memory store, and sessions would
+        # only work on the worker that created the account.
+        parser.error('--workers > 1 needs --mongo; the in-memory store is per worker')
+
+    env = dict(BENCH_ENV, **({'MONGO_URI': args.mongo} if args.mongo else MEMORY_ENV))
+    server = None
+    target = 'test-client'
+    if args.gunicorn:
+        port = _free_port()
+        command = [sys.executable, '-m', 'gunicorn', 'app:app', '-b', f'127.0.0.1:{port}',
+                   '-w', str(args.workers)]
+        if args.threads:
+            command += ['--threads', str(args.threads)]
+        server = subprocess.Popen(command, cwd=ROOT, env=dict(os.environ, **env))
+        _wait_for_port(port)
+        args.url = f'http://127.0.0.1:{port}'
+    if args.url:
+        target = args.url if server is None else f'gunicorn -w {args.workers}' + (
+            f' --threads {args.threads}' if args.threads else '')
+        make_session = lambda *a: HttpSession(args.url, *a)
+    else:
+        os.environ.update(env)
+        sys.path.insert(0, ROOT)
+        import app as app_module
+        make_session = lambda *a: TestClientSession(app_module.app, *a)
+
+    try:
+        result = run(args.scenario, make_session, args.users, args.iterations, args.warmup, args.seed)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    result['meta'] = {
+        'scenario': args.scenario,
+        'description': SCENARIOS[args.scenario].description,
+        'commit': _git_commit(),
+        'target': target,
+        'store': 'mongo' if args.mongo else 'memory',
+        'users': args.users,
+        'iterations': args.iterations,
+        'warmup': args.warmup,
+        'seed': args.seed,
+        'python': platform.python_version(),
+        'recorded_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    out = args.out or os.path.join(ROOT, 'bench', 'results', f'{args.scenario}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w', encoding='utf-8') as fh:
+        json.dump(result, fh, indent=2, sort_keys=True)
+        fh.write('\n')
+    print_report(result)
+    print(f'\nWrote {out}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,97 @@
+"""Classroom traffic mixes replayed by ``bench/run.py``.
+
+A scenario says how many of the virtual users are students or parents and,
+for each role, which actions they pick (by weight) on every iteration. An
+action issues one or more requests through ``session.request(label, ...)``;
+the label is what the report groups timings by.
+"""
+import json
+import random
+from typing import Callable, List, Tuple
+
+SECTIONS = ['colors', 'animals', 'fruits', 'vegetables', 'numbers', 'strokes']
+QUIZ_SUBJECTS = ['math', 'science', 'gk', 'grammar', 'history']
+LESSON_PAGES = ['/primary_section', '/math', '/science', '/gk', '/grammar', '/history', '/pre-primary', '/colors']
+LEADERBOARDS = ['global', 'weekly', 'math', 'history']
+
+Action = Callable[[object, random.Random], None]
+
+
+# -------------------- STUDENT ACTIONS --------------------
+def game_tick(session, rng):
+    session.request('POST /preprimary/progress/update', 'POST', '/preprimary/progress/update',
+                    json={'section': rng.choice(SECTIONS), 'inc_games': 1})
+
+
+def video_watched(session, rng):
+    session.request('POST /preprimary/progress/update', 'POST', '/preprimary/progress/update',
+                    json={'section': rng.choice(SECTIONS), 'video_watched': True})
+
+
+def section_quiz(session, rng):
+    session.request('POST /preprimary/progress/update', 'POST', '/preprimary/progress/update',
+                    json={'section': rng.choice(SECTIONS), 'quiz_score': rng.randint(0, 4)})
+
+
+def lesson_page(session, rng):
+    session.request('GET <lesson page>', 'GET', rng.choice(LESSON_PAGES))
+
+
+def take_quiz(session, rng):
+    subject = rng.choice(QUIZ_SUBJECTS)
+    status, body = session.request('GET /api/quiz/<subject>', 'GET',
+                                   f'/api/quiz/{subject}?seed={rng.randrange(64)}')
+    if status != 200:
+        return
+    quiz = json.loads(body)
+    answers = {q['id']: rng.choice(q['options']) for q in quiz['questions']}
+    session.request('POST /api/quiz/<subject>/grade', 'POST', f'/api/quiz/{subject}/grade',
+                    json={'answers': answers, 'seed': quiz['seed']})
+
+
+def view_leaderboard(session, rng):
+    session.request('GET /api/leaderboard/<scope>', 'GET', f'/api/leaderboard/{rng.choice(LEADERBOARDS)}')
+
+
+def relogin(session, rng):
+    session.request('GET /logout', 'GET', '/logout', logs_out=True)
+    session.login()
+
+
+# -------------------- PARENT ACTIONS --------------------
+def dashboard(session, rng):
+    session.request('GET /parent_dashboard', 'GET', '/parent_dashboard')
+
+
+def older_activity(session, rng):
+    session.request('GET /parent/activity', 'GET', '/parent/activity?days=7')
+
+
+class Scenario:
+    def __init__(self, name: str, description: str, parent_share: float,
+                 student_actions: List[Tuple[int, Action]], parent_actions: List[Tuple[int, Action]] = ()):
+        self.name = name
+        self.description = description
+        self.parent_share = parent_share
+        self.student_actions = list(student_actions)
+        self.parent_actions = list(parent_actions)
+
+    def pick(self, role: str, rng: random.Random) -> Action:
+        actions = self.student_actions if role == 'student' else self.parent_actions
+        return rng.choices([a for _, a in actions], weights=[w for w, _ in actions])[0]
+
+
+SCENARIOS = {s.name: s for s in [
+    Scenario('login-burst', 'Every student logs out and back in, all at once', 0.0,
+             [(1, relogin)]),
+    Scenario('game-ticks', 'Pre-primary games posting progress as fast as they can', 0.0,
+             [(10, game_tick), (1, video_watched), (2, section_quiz)]),
+    Scenario('dashboard', 'Parents refreshing the dashboard and paging activity', 1.0,
+             [], [(5, dashboard), (2, older_activity)]),
+    Scenario('quiz', 'Students taking quizzes and checking leaderboards', 0.0,
+             [(3, take_quiz), (2, view_leaderboard), (2, lesson_page)]),
+    Scenario('classroom', 'A lesson in progress: mostly game ticks, some quizzes, a few parents', 0.2,
+             [(10, game_tick), (1, video_watched), (2, section_quiz), (2, take_quiz),
+              (3, lesson_page), (1, view_leaderboard)],
+             [(3, dashboard), (1, older_activity)]),
+]}
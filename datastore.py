@@ -0,0 +1,181 @@
+"""Lazily connected, fork-safe access to MongoDB with an in-memory fallback.
+
+Nothing here touches the network at import time. Each process (every
+gunicorn worker, including ones forked from a ``--preload`` master) builds
+its own ``MongoClient`` on first use, and a background health check moves
+the process between MongoDB and the in-memory store as the server comes and
+goes.
+"""
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import pymongo
+from pymongo import MongoClient
+from pymongo.errors import ConnectionFailure
+
+from memstore import MemoryDatabase
+
+MODE_MONGO = 'mongo'
+MODE_MEMORY = 'memory'
+
+
+class CollectionProxy:
+    """Stand-in for a collection that resolves the live backend on each call."""
+
+    def __init__(self, store: 'DataStore', name: str):
+        self._store = store
+        self.name = name
+
+    def resolve(self) -> Tuple[str, Any]:
+        """The live backend's mode and collection.
+
+        Write buffers pin a failed batch to it, so a retry goes to the backend
+        the writes were meant for rather than wherever the store is now.
+        """
+        coll = self._store.backend_collection(self.name)
+        return self._store.mode, coll
+
+    def __getattr__(self, attr: str) -> Any:
+        target = getattr(self._store.backend_collection(self.name), attr)
+        if not callable(target):
+            return target
+        store = self._store
+
+        def call(*args, **kwargs):
+            try:
+                return target(*args, **kwargs)
+            except ConnectionFailure:
+                # One timeout is not an outage: re-ping, and switch only if that fails
+                store.request_check()
+                raise
+        return call
+
+
+class DataStore:
+    def __init__(self, uri: Optional[str], db_name: str = 'logindb', *,
+                 client_options: Optional[Dict[str, Any]] = None,
+                 startup_timeout: float = 1.5, health_interval: float = 10.0,
+                 snapshot_path: Optional[str] = None, snapshot_interval: float = 30.0):
+        self.uri = uri
+        self.db_name = db_name
+        self.client_options = dict(client_options or {})
+        self.startup_timeout = startup_timeout
+        self.health_interval = health_interval
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+        self._indexes: Dict[str, List[Tuple[Any, Dict[str, Any]]]] = {}
+        self._lock = threading.RLock()
+        self._pid: Optional[int] = None
+        self._client: Optional[MongoClient] = None
+        self._memory: Optional[MemoryDatabase] = None
+        self._indexed: set = set()
+        self._check = threading.Event()
+        self.mode: Optional[str] = None
+        self.mode_changes = 0
+        # Collection calls served by each backend, for monitoring
+        self.calls: Dict[str, int] = {MODE_MONGO: 0, MODE_MEMORY: 0}
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self.reset)
+
+    # ---- configuration ----
+    def collection(self, name: str) -> CollectionProxy:
+        return CollectionProxy(self, name)
+
+    def add_index(self, collection: str, keys: Any, **kwargs) -> None:
+        self._indexes.setdefault(collection, []).append((keys, kwargs))
+
+    # ---- lifecycle ----
+    def reset(self) -> None:
+        # A MongoClient must not be shared across fork(); the child starts
+        # over and connects on first use. The parent's sockets are left
+        # alone (closing them here would close them for the parent too).
+        self._lock = threading.RLock()
+        self._pid = None
+        self._client = None
+        self._indexed = set()
+        self._check = threading.Event()
+        self.mode = None
+
+    def _ensure(self) -> None:
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._client = MongoClient(self.uri, **self.client_options)
+            self._set_mode(MODE_MONGO if self._ping(self.startup_timeout) else MODE_MEMORY)
+            self._pid = os.getpid()
+            if self.health_interval > 0:
+                threading.Thread(target=self._health_loop, name='mongo-health', daemon=True).start()
+
+    def _ping(self, timeout: float) -> bool:
+        try:
+            with pymongo.timeout(timeout):
+                self._client.admin.command('ping')
+            return True
+        except Exception as e:
+            if self.mode != MODE_MEMORY:
+                print("MongoDB connection failed:", e)
+            return False
+
+    def _set_mode(self, mode: str) -> None:
+        if mode == self.mode:
+            return
+        if mode == MODE_MONGO:
+            print("MongoDB connected successfully!")
+        else:
+            print("Using fallback in-memory DB until MongoDB is reachable again.")
+        if self.mode is not None:
+            self.mode_changes += 1
+        self.mode = mode
+
+    def request_check(self) -> None:
+        """Ping MongoDB now (from the health thread, if there is one)."""
+        if self.health_interval > 0:
+            self._check.set()
+        elif self.mode == MODE_MONGO:
+            self._set_mode(MODE_MONGO if self._ping(self.startup_timeout) else MODE_MEMORY)
+
+    def _health_loop(self) -> None:
+        pid = os.getpid()
+        while self._pid in (pid, None):
+            check = self._check
+            check.wait(self.health_interval)
+            check.clear()
+            if self._pid != pid:
+                return
+            self._set_mode(MODE_MONGO if self._ping(self.health_interval) else MODE_MEMORY)
+
+    # ---- backends ----
+    def memory_db(self) -> MemoryDatabase:
+        if self._memory is None:
+            with self._lock:
+                if self._memory is None:
+                    self._memory = MemoryDatabase(self.snapshot_path)
+        self._memory.start_autosave(self.snapshot_interval)
+        return self._memory
+
+    def database(self) -> Any:
+        self._ensure()
+        if self.mode == MODE_MONGO:
+            return self._client[self.db_name]
+        return self.memory_db()
+
+    def backend_collection(self, name: str) -> Any:
+        db = self.database()
+        coll = db[name]
+        self.calls[self.mode] += 1
+        key = (self.mode, name)
+        if key not in self._indexed:
+            # Other threads wait until the indexes (unique ones especially)
+            # exist before they write to the collection.
+            with self._lock:
+                if key not in self._indexed:
+                    for keys, kwargs in self._indexes.get(name, []):
+                        try:
+                            coll.create_index(keys, **kwargs)
+                        except Exception as e:
+                            print("Index creation failed:", e)
+                    self._indexed.add(key)
+        return coll
@@ -0,0 +1,32 @@
+# Picked up automatically by `gunicorn app:app` (see Procfile).
+import os
+import sys
+
+# Most requests spend their time waiting on MongoDB, so each worker process
+# serves several at once on threads (`gthread`) instead of one (`sync`).
+# Capacity is workers x threads concurrent requests; every worker has its own
+# MongoDB pool, so keep GUNICORN_THREADS <= MONGO_MAX_POOL_SIZE.
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "gthread")
+# One worker by default: the in-memory fallback store is per process, so
+# more workers would each see a different copy of it while MongoDB is down.
+workers = int(os.environ.get("WEB_CONCURRENCY", "1"))
+threads = int(os.environ.get("GUNICORN_THREADS", "8"))
+# Idle keep-alive connections hold a thread slot in gthread workers.
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", "5"))
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "30"))
+
+
+def on_starting(server):
+    pool_size = int(os.environ.get("MONGO_MAX_POOL_SIZE", "50"))
+    if server.cfg.threads > pool_size:
+        print(f"Warning: {server.cfg.threads} threads per worker but MONGO_MAX_POOL_SIZE={pool_size}; "
+              "requests will queue for MongoDB connections.")
+
+
+def worker_exit(server, worker):
+    # Push any coalesced writes before the worker goes away.
+    app_module = sys.modules.get('app')
+    for name in ('progress_writes', 'activity_writes', 'time_writes', 'time_totals', 'leaderboard'):
+        buffer = getattr(app_module, name, None)
+        if buffer is not None:
+            buffer.flush()
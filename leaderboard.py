@@ -0,0 +1,261 @@
+"""Leaderboards and daily streaks maintained as points are earned.
+
+Each board is a score map plus a list kept sorted with ``bisect``, so a top-K
+read is a slice and "my rank" is one binary search; nothing sorts the
+``users`` collection. Points are applied in memory immediately, buffered as
+deltas and written to the ``leaderboard`` collection with ``$inc`` upserts
+every ``flush_interval`` seconds. Every ``refresh_interval`` seconds a worker
+reloads its boards from that collection so it also sees points earned
+through other workers.
+"""
+import atexit
+import os
+import threading
+import time
+from bisect import bisect_left, insort
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
+
+GLOBAL = 'global'
+
+
+def subject_board(subject: str) -> str:
+    return f'subject:{subject}'
+
+
+def week_board(when: Optional[date] = None) -> str:
+    year, week, _ = (when or datetime.now()).isocalendar()
+    return f'week:{year}-W{week:02d}'
+
+
+class SortedBoard:
+    """Scores for one board, ordered highest first (ties by member)."""
+
+    def __init__(self):
+        self._scores: Dict[str, int] = {}
+        self._order: List[Tuple[int, str]] = []
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def score(self, member: str) -> Optional[int]:
+        return self._scores.get(member)
+
+    def set(self, member: str, score: int) -> None:
+        old = self._scores.get(member)
+        if old is not None:
+            del self._order[bisect_left(self._order, (-old, member))]
+        self._scores[member] = score
+        insort(self._order, (-score, member))
+
+    def incr(self, member: str, delta: int) -> int:
+        score = self._scores.get(member, 0) + delta
+        self.set(member, score)
+        return score
+
+    def rank(self, member: str) -> Optional[int]:
+        """1-based rank; equal scores share the better rank."""
+        score = self._scores.get(member)
+        if score is None:
+            return None
+        return bisect_left(self._order, (-score, '')) + 1
+
+    def top(self, k: int) -> List[Tuple[int, str, int]]:
+        """``(rank, member, score)`` for the first ``k`` entries."""
+        out: List[Tuple[int, str, int]] = []
+        rank = 0
+        for i, (neg, member) in enumerate(self._order[:k]):
+            if not out or -neg != out[-1][2]:
+                rank = i + 1
+            out.append((rank, member, -neg))
+        return out
+
+
+class Leaderboard:
+    """Global, per-subject and weekly boards for one process.
+
+    Only the global board, the boards of ``subjects`` and the current and
+    previous week are held in memory.
+    """
+
+    def __init__(self, collection: Any, subjects: Iterable[str] = (),
+                 flush_interval: float = 5.0, refresh_interval: float = 60.0):
+        self.collection = collection
+        self.subjects = list(subjects)
+        self.flush_interval = flush_interval
+        self.refresh_interval = refresh_interval
+        self._boards: Dict[str, SortedBoard] = {}
+        self._names: Dict[str, str] = {}
+        self._pending: Dict[Tuple[str, str], int] = {}
+        # Failed flushes, each kept with the collection it was sent to so it
+        # is retried there (not in whatever backend the store uses now)
+        self._unsent: List[Tuple[Any, Dict[Tuple[str, str], int]]] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pid: Optional[int] = None
+        atexit.register(self.flush)
+
+    def _live_boards(self) -> List[str]:
+        today = datetime.now().date()
+        return ([GLOBAL] + [subject_board(s) for s in self.subjects]
+                + [week_board(today), week_board(today - timedelta(days=7))])
+
+    # ---- writes ----
+    def record(self, member: str, name: str, points: int, subject: Optional[str] = None) -> None:
+        self._ensure()
+        boards = [GLOBAL, week_board()]
+        if subject:
+            boards.append(subject_board(subject))
+        with self._lock:
+            self._names[member] = name
+            for board in boards:
+                self._boards.setdefault(board, SortedBoard()).incr(member, points)
+                key = (board, member)
+                self._pending[key] = self._pending.get(key, 0) + points
+
+    def flush(self) -> int:
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                batches, self._unsent = self._unsent, []
+                names = dict(self._names)
+            if pending:
+                resolve = getattr(self.collection, 'resolve', None)
+                batches.append((resolve()[1] if resolve else self.collection, pending))
+            written = 0
+            for target, deltas in batches:
+                ops = [UpdateOne({'board': board, 'member': member},
+                                 {'$inc': {'score': delta}, '$set': {'name': names.get(member, '')}},
+                                 upsert=True)
+                       for (board, member), delta in deltas.items()]
+                try:
+                    target.bulk_write(ops, ordered=False)
+                except BulkWriteError as e:
+                    print('Leaderboard flush had errors:', e.details.get('writeErrors'))
+                except Exception as e:
+                    print('Leaderboard flush failed, will retry:', e)
+                    with self._lock:
+                        self._unsent.append((target, deltas))
+                    continue
+                written += len(ops)
+            return written
+
+    # ---- reads ----
+    def top(self, board: str, k: int = 10) -> List[Dict[str, Any]]:
+        self._ensure()
+        with self._lock:
+            entries = self._boards.get(board, SortedBoard()).top(k)
+            return [{'rank': rank, 'name': self._names.get(member, ''), 'score': score, 'member': member}
+                    for rank, member, score in entries]
+
+    def rank(self, board: str, member: str) -> Optional[Dict[str, int]]:
+        self._ensure()
+        with self._lock:
+            entries = self._boards.get(board)
+            if entries is None or entries.score(member) is None:
+                return None
+            return {'rank': entries.rank(member), 'score': entries.score(member), 'of': len(entries)}
+
+    # ---- loading ----
+    def refresh(self) -> None:
+        """Flush local deltas, then rebuild the boards from the collection."""
+        self.flush()
+        boards: Dict[str, SortedBoard] = {}
+        names: Dict[str, str] = {}
+        cursor = self.collection.find(
+            {'board': {'$in': self._live_boards()}},
+            {'_id': 0, 'board': 1, 'member': 1, 'score': 1, 'name': 1},
+        ).batch_size(1000)
+        for doc in cursor:
+            boards.setdefault(doc['board'], SortedBoard()).set(doc['member'], doc.get('score', 0))
+            if doc.get('name'):
+                names[doc['member']] = doc['name']
+        with self._lock:
+            # Points recorded while the collection was being read are not in
+            # it yet; carry them over.
+            unflushed = [self._pending] + [deltas for _, deltas in self._unsent]
+            for deltas in unflushed:
+                for (board, member), delta in deltas.items():
+                    boards.setdefault(board, SortedBoard()).incr(member, delta)
+            names.update(self._names)
+            self._boards = boards
+            self._names = names
+
+    def _ensure(self) -> None:
+        if self._pid == os.getpid():
+            return
+        with self._flush_lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+        try:
+            self.refresh()
+        except Exception as e:
+            print('Leaderboard load failed:', e)
+        threading.Thread(target=self._run, name='leaderboard-flusher', daemon=True).start()
+
+    def _run(self) -> None:
+        last_refresh = time.monotonic()
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                if time.monotonic() - last_refresh >= self.refresh_interval:
+                    self.refresh()
+                    last_refresh = time.monotonic()
+                else:
+                    self.flush()
+            except Exception as e:
+                print('Leaderboard flush failed:', e)
+
+
+class StreakTracker:
+    """Consecutive-day activity streaks, stored on the user document as
+    ``streak: {current, best, day}``.
+
+    Each worker remembers the day it last counted per student, so only the
+    first activity of a day reaches the database.
+    """
+
+    def __init__(self, collection: Any, max_keys: int = 100000):
+        self.collection = collection
+        self.max_keys = max_keys
+        self._seen: 'OrderedDict[str, str]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def touch(self, member: str, today: Optional[date] = None) -> Optional[Dict[str, int]]:
+        """Count today for ``member``; return the streak if it changed."""
+        today = today or datetime.now().date()
+        day = today.isoformat()
+        with self._lock:
+            if self._seen.get(member) == day:
+                return None
+            self._seen.pop(member, None)
+            self._seen[member] = day
+            if len(self._seen) > self.max_keys:
+                self._seen.popitem(last=False)
+
+        projection = {'_id': 0, 'streak': 1}
+        # Active yesterday: extend. Otherwise (and not yet counted today by
+        # another worker): start over at 1. Both are single atomic updates.
+        doc = self.collection.find_one_and_update(
+            {'email': member, 'streak.day': (today - timedelta(days=1)).isoformat()},
+            {'$inc': {'streak.current': 1}, '$set': {'streak.day': day}},
+            projection=projection, return_document=ReturnDocument.AFTER,
+        )
+        if doc is None:
+            doc = self.collection.find_one_and_update(
+                {'email': member, 'streak.day': {'$ne': day}},
+                {'$set': {'streak.current': 1, 'streak.day': day}},
+                projection=projection, return_document=ReturnDocument.AFTER,
+            )
+        if doc is None:
+            return None
+        streak = doc['streak']
+        if streak['current'] > streak.get('best', 0):
+            self.collection.update_one({'email': member}, {'$max': {'streak.best': streak['current']}})
+            streak['best'] = streak['current']
+        return streak
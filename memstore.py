@@ -0,0 +1,695 @@
+"""In-process stand-in for the pymongo collections used by app.py.
+
+Used when MongoDB is unreachable (local dev, staging fallback, load tests).
+Lookups on indexed fields are O(1) hash hits instead of linear scans, and the
+update operators app.py relies on behave the way MongoDB applies them.
+"""
+import atexit
+import copy
+import functools
+import os
+import tempfile
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, the snapshot is not guarded
+    fcntl = None
+
+from bson import ObjectId, json_util
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from pymongo.results import (BulkWriteResult, DeleteResult, InsertManyResult,
+                             InsertOneResult, UpdateResult)
+
+_MISSING = object()
+
+
+# -------------------- DOCUMENT HELPERS --------------------
+def _get(doc: Any, path: str) -> Any:
+    target = doc
+    parts = path.split('.')
+    for i, part in enumerate(parts):
+        if isinstance(target, dict):
+            target = target.get(part, _MISSING)
+        elif isinstance(target, list) and part.isdigit() and int(part) < len(target):
+            target = target[int(part)]
+        elif isinstance(target, list):
+            # Like MongoDB, 'items.work' reaches into every element of an array
+            rest = '.'.join(parts[i:])
+            values: List[Any] = []
+            for element in target:
+                value = _get(element, rest) if isinstance(element, dict) else _MISSING
+                if isinstance(value, list):
+                    values.extend(value)
+                elif value is not _MISSING:
+                    values.append(value)
+            return values or _MISSING
+        else:
+            return _MISSING
+        if target is _MISSING:
+            return _MISSING
+    return target
+
+
+def _parent(doc: dict, path: str, create: bool = True) -> Tuple[Optional[dict], str]:
+    parts = path.split('.')
+    target = doc
+    for p in parts[:-1]:
+        nxt = target.get(p)
+        if nxt is None:
+            if not create:
+                return None, parts[-1]
+            nxt = target[p] = {}
+        elif not isinstance(nxt, dict):
+            raise OperationFailure(f"Cannot create field '{parts[-1]}' in element {{{p}: {nxt!r}}}")
+        target = nxt
+    return target, parts[-1]
+
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, dict):
+        return tuple((k, _freeze(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _sort_key(value: Any) -> Tuple:
+    # Missing/None sort first, like MongoDB; numbers before strings.
+    if value is _MISSING or value is None:
+        return (0,)
+    if isinstance(value, bool):
+        return (3, value)
+    if isinstance(value, (int, float)):
+        return (1, value)
+    if isinstance(value, str):
+        return (2, value)
+    return (4, str(value))
+
+
+# -------------------- QUERY MATCHING --------------------
+def _compare(value: Any, op: str, arg: Any) -> bool:
+    if op == '$eq':
+        return value == arg or (isinstance(value, list) and arg in value)
+    if op == '$ne':
+        return not _compare(value, '$eq', arg)
+    if op == '$in':
+        return any(_compare(value, '$eq', a) for a in arg)
+    if op == '$nin':
+        return not _compare(value, '$in', arg)
+    if op == '$exists':
+        return (value is not _MISSING) == bool(arg)
+    if value is _MISSING or value is None:
+        return False
+    try:
+        if op == '$gt':
+            return value > arg
+        if op == '$gte':
+            return value >= arg
+        if op == '$lt':
+            return value < arg
+        if op == '$lte':
+            return value <= arg
+    except TypeError:
+        return False
+    raise OperationFailure(f'unknown operator: {op}')
+
+
+def _match(doc: dict, query: Dict[str, Any]) -> bool:
+    for key, cond in query.items():
+        if key == '$and':
+            if not all(_match(doc, q) for q in cond):
+                return False
+            continue
+        if key == '$or':
+            if not any(_match(doc, q) for q in cond):
+                return False
+            continue
+        value = _get(doc, key)
+        if isinstance(cond, dict) and cond and all(k.startswith('$') for k in cond):
+            if not all(_compare(value, op, arg) for op, arg in cond.items()):
+                return False
+        elif value is _MISSING:
+            if cond is not None:
+                return False
+        elif not _compare(value, '$eq', cond):
+            return False
+    return True
+
+
+def _equality_fields(query: Dict[str, Any]) -> Dict[str, Any]:
+    fields = {}
+    for key, cond in query.items():
+        if key.startswith('$'):
+            continue
+        if isinstance(cond, dict) and cond and all(k.startswith('$') for k in cond):
+            if '$eq' in cond:
+                fields[key] = cond['$eq']
+            continue
+        fields[key] = cond
+    return fields
+
+
+# -------------------- UPDATE OPERATORS --------------------
+def _apply_update(doc: dict, update: Dict[str, Any], inserting: bool = False) -> None:
+    if not update or not all(k.startswith('$') for k in update):
+        raise OperationFailure('update only works with $ operators')
+    for op, fields in update.items():
+        if op == '$setOnInsert' and not inserting:
+            continue
+        for path, arg in fields.items():
+            if path == '_id' and op != '$setOnInsert':
+                raise OperationFailure("Performing an update on the path '_id' would modify the immutable field '_id'")
+            if op == '$unset':
+                target, leaf = _parent(doc, path, create=False)
+                if target is not None:
+                    target.pop(leaf, None)
+                continue
+            target, leaf = _parent(doc, path)
+            current = target.get(leaf, _MISSING)
+            if op in ('$set', '$setOnInsert'):
+                target[leaf] = copy.deepcopy(arg)
+            elif op == '$inc':
+                if current is _MISSING:
+                    current = 0
+                elif not isinstance(current, (int, float)):
+                    raise OperationFailure(f"Cannot apply $inc to a value of non-numeric type at '{path}'")
+                target[leaf] = current + arg
+            elif op == '$max':
+                if current is _MISSING or _sort_key(arg) > _sort_key(current):
+                    target[leaf] = copy.deepcopy(arg)
+            elif op == '$min':
+                if current is _MISSING or _sort_key(arg) < _sort_key(current):
+                    target[leaf] = copy.deepcopy(arg)
+            elif op in ('$push', '$addToSet', '$pull'):
+                if current is _MISSING:
+                    current = target[leaf] = []
+                elif not isinstance(current, list):
+                    raise OperationFailure(f"The field '{path}' must be an array")
+                if op == '$pull':
+                    if isinstance(arg, dict) and arg and all(k.startswith('$') for k in arg):
+                        current[:] = [v for v in current if not all(_compare(v, o, a) for o, a in arg.items())]
+                    elif isinstance(arg, dict):
+                        current[:] = [v for v in current if not (isinstance(v, dict) and _match(v, arg))]
+                    else:
+                        current[:] = [v for v in current if v != arg]
+                    continue
+                modifiers = isinstance(arg, dict) and '$each' in arg
+                items = arg['$each'] if modifiers else [arg]
+                if op == '$addToSet':
+                    for item in items:
+                        if item not in current:
+                            current.append(copy.deepcopy(item))
+                    continue
+                position = arg.get('$position') if modifiers else None
+                items = copy.deepcopy(list(items))
+                if position is None:
+                    current.extend(items)
+                else:
+                    current[position:position] = items
+                if modifiers and '$slice' in arg:
+                    limit = arg['$slice']
+                    current[:] = current[limit:] if limit < 0 else current[:limit]
+            else:
+                raise OperationFailure(f'Unknown modifier: {op}')
+
+
+def _project(doc: dict, projection: Optional[Any]) -> dict:
+    if not projection:
+        return copy.deepcopy(doc)
+    if isinstance(projection, (list, tuple)):
+        projection = {k: 1 for k in projection}
+    include_id = bool(projection.get('_id', 1))
+    fields = {k: v for k, v in projection.items() if k != '_id'}
+    if fields and all(fields.values()):
+        out: Dict[str, Any] = {}
+        if include_id and '_id' in doc:
+            out['_id'] = doc['_id']
+        for path in fields:
+            value = _get(doc, path)
+            if value is not _MISSING:
+                target, leaf = _parent(out, path)
+                target[leaf] = copy.deepcopy(value)
+        return out
+    out = copy.deepcopy(doc)
+    for path in fields:
+        target, leaf = _parent(out, path, create=False)
+        if target is not None:
+            target.pop(leaf, None)
+    if not include_id:
+        out.pop('_id', None)
+    return out
+
+
+def _normalize_keys(keys: Any, direction: int = 1) -> List[Tuple[str, int]]:
+    if isinstance(keys, str):
+        return [(keys, direction)]
+    return [(k, d) for k, d in keys]
+
+
+# -------------------- INDEXES --------------------
+class _Index:
+    def __init__(self, name: str, fields: Tuple[str, ...], unique: bool):
+        self.name = name
+        self.fields = fields
+        self.unique = unique
+        self.entries: Dict[Any, set] = {}
+
+    def key(self, doc: dict) -> Any:
+        values = []
+        for f in self.fields:
+            v = _get(doc, f)
+            values.append(None if v is _MISSING else _freeze(v))
+        return tuple(values)
+
+    def add(self, doc: dict) -> None:
+        self.entries.setdefault(self.key(doc), set()).add(doc['_id'])
+
+    def remove(self, doc: dict) -> None:
+        key = self.key(doc)
+        ids = self.entries.get(key)
+        if ids is not None:
+            ids.discard(doc['_id'])
+            if not ids:
+                del self.entries[key]
+
+    def conflicts(self, doc: dict) -> bool:
+        if not self.unique:
+            return False
+        ids = self.entries.get(self.key(doc))
+        return bool(ids) and ids != {doc['_id']}
+
+
+def _locked(method):
+    # The write-behind flusher and threaded workers touch collections from
+    # several threads; each public operation runs under the collection lock.
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+# -------------------- CURSOR --------------------
+class MemoryCursor:
+    def __init__(self, collection: 'MemoryCollection', query: Dict[str, Any], projection: Any = None):
+        self._collection = collection
+        self._query = query
+        self._projection = projection
+        self._sort: List[Tuple[str, int]] = []
+        self._skip = 0
+        self._limit = 0
+
+    def sort(self, key_or_list: Any, direction: Optional[int] = None) -> 'MemoryCursor':
+        self._sort = _normalize_keys(key_or_list, direction or 1)
+        return self
+
+    def skip(self, n: int) -> 'MemoryCursor':
+        self._skip = n
+        return self
+
+    def limit(self, n: int) -> 'MemoryCursor':
+        self._limit = n
+        return self
+
+    def batch_size(self, n: int) -> 'MemoryCursor':
+        return self
+
+    def __iter__(self):
+        with self._collection._lock:
+            docs = self._collection._matching(self._query)
+            for field, direction in reversed(self._sort):
+                docs.sort(key=lambda d: _sort_key(_get(d, field)), reverse=direction < 0)
+            end = self._skip + self._limit if self._limit else None
+            page = [_project(doc, self._projection) for doc in docs[self._skip:end]]
+        yield from page
+
+
+# -------------------- COLLECTION --------------------
+class MemoryCollection:
+    """A single collection: documents keyed by ``_id`` plus hash indexes."""
+
+    def __init__(self, name: str = 'collection', database: Optional['MemoryDatabase'] = None):
+        self.name = name
+        self._database = database
+        self._docs: Dict[Any, dict] = {}
+        self._indexes: Dict[str, _Index] = {'_id_': _Index('_id_', ('_id',), True)}
+        self._lock = threading.RLock()
+
+    def _touch(self) -> None:
+        if self._database is not None:
+            self._database._version += 1
+
+    # ---- indexes ----
+    @_locked
+    def create_index(self, keys: Any, unique: bool = False, name: Optional[str] = None, **kwargs) -> str:
+        fields = tuple(k for k, _ in _normalize_keys(keys))
+        name = name or '_'.join(f'{k}_1' for k in fields)
+        existing = self._indexes.get(name)
+        if existing is not None:
+            return name
+        index = _Index(name, fields, unique)
+        for doc in self._docs.values():
+            if index.conflicts(doc):
+                raise DuplicateKeyError(f'E11000 duplicate key error index: {name} dup key: {index.key(doc)}', 11000)
+            index.add(doc)
+        self._indexes[name] = index
+        self._touch()
+        return name
+
+    @_locked
+    def index_information(self) -> Dict[str, Any]:
+        return {name: {'key': [(f, 1) for f in ix.fields], 'unique': ix.unique}
+                for name, ix in self._indexes.items()}
+
+    def _index_add(self, doc: dict) -> None:
+        for index in self._indexes.values():
+            if index.conflicts(doc):
+                raise DuplicateKeyError(
+                    f'E11000 duplicate key error collection: {self.name} index: {index.name} dup key: {index.key(doc)}',
+                    11000,
+                )
+        for index in self._indexes.values():
+            index.add(doc)
+
+    def _candidates(self, query: Dict[str, Any]) -> Iterable[dict]:
+        equal = _equality_fields(query)
+        best = None
+        if equal:
+            for index in self._indexes.values():
+                if all(f in equal for f in index.fields):
+                    if best is None or (index.unique and not best.unique) or len(index.fields) > len(best.fields):
+                        best = index
+        if best is None:
+            return list(self._docs.values())
+        key = tuple(_freeze(equal[f]) for f in best.fields)
+        return [self._docs[i] for i in best.entries.get(key, ())]
+
+    def _matching(self, query: Optional[Dict[str, Any]], first: bool = False) -> List[dict]:
+        query = query or {}
+        out = []
+        for doc in self._candidates(query):
+            if _match(doc, query):
+                out.append(doc)
+                if first:
+                    break
+        return out
+
+    # ---- reads ----
+    @_locked
+    def find_one(self, query: Optional[Dict[str, Any]] = None, projection: Any = None, sort: Any = None) -> Optional[dict]:
+        if sort:
+            for doc in MemoryCursor(self, query or {}, projection).sort(sort).limit(1):
+                return doc
+            return None
+        found = self._matching(query, first=True)
+        return _project(found[0], projection) if found else None
+
+    def find(self, query: Optional[Dict[str, Any]] = None, projection: Any = None, sort: Any = None,
+             skip: int = 0, limit: int = 0, batch_size: int = 0) -> MemoryCursor:
+        cursor = MemoryCursor(self, query or {}, projection).skip(skip).limit(limit)
+        return cursor.sort(sort) if sort else cursor
+
+    @_locked
+    def count_documents(self, query: Dict[str, Any]) -> int:
+        return len(self._matching(query))
+
+    def estimated_document_count(self) -> int:
+        return len(self._docs)
+
+    # ---- writes ----
+    def _insert(self, doc: dict) -> Any:
+        if '_id' not in doc:
+            doc['_id'] = ObjectId()
+        stored = copy.deepcopy(doc)
+        self._index_add(stored)
+        self._docs[stored['_id']] = stored
+        return stored['_id']
+
+    @_locked
+    def insert_one(self, doc: dict) -> InsertOneResult:
+        inserted_id = self._insert(doc)
+        self._touch()
+        return InsertOneResult(inserted_id, True)
+
+    @_locked
+    def insert_many(self, docs: Iterable[dict], ordered: bool = True) -> InsertManyResult:
+        ids, errors = [], []
+        for i, doc in enumerate(docs):
+            try:
+                ids.append(self._insert(doc))
+            except DuplicateKeyError as exc:
+                errors.append({'index': i, 'code': 11000, 'errmsg': str(exc), 'op': doc})
+                if ordered:
+                    break
+        if ids:
+            self._touch()
+        if errors:
+            raise BulkWriteError({'writeErrors': errors, 'writeConcernErrors': [], 'nInserted': len(ids),
+                                  'nUpserted': 0, 'nMatched': 0, 'nModified': 0, 'nRemoved': 0, 'upserted': []})
+        return InsertManyResult(ids, True)
+
+    def _replace(self, old: dict, new: dict) -> None:
+        for index in self._indexes.values():
+            index.remove(old)
+        try:
+            self._index_add(new)
+        except DuplicateKeyError:
+            for index in self._indexes.values():
+                index.add(old)
+            raise
+        self._docs[new['_id']] = new
+
+    def _upsert_doc(self, filter_q: Dict[str, Any], update: Dict[str, Any]) -> dict:
+        doc: Dict[str, Any] = {}
+        for path, value in _equality_fields(filter_q).items():
+            target, leaf = _parent(doc, path)
+            target[leaf] = copy.deepcopy(value)
+        _apply_update(doc, update, inserting=True)
+        self._insert(doc)
+        return self._docs[doc['_id']]
+
+    def _update(self, filter_q: Dict[str, Any], update: Dict[str, Any], upsert: bool, many: bool) -> Dict[str, Any]:
+        if isinstance(update, list):
+            raise OperationFailure('pipeline updates are not supported by the in-memory store')
+        matched = self._matching(filter_q, first=not many)
+        if not matched:
+            if not upsert:
+                return {'n': 0, 'nModified': 0}
+            doc = self._upsert_doc(filter_q, update)
+            self._touch()
+            return {'n': 1, 'nModified': 0, 'upserted': doc['_id']}
+        modified = 0
+        for old in matched:
+            new = copy.deepcopy(old)
+            _apply_update(new, update)
+            if new != old:
+                self._replace(old, new)
+                modified += 1
+        if modified:
+            self._touch()
+        return {'n': len(matched), 'nModified': modified}
+
+    @_locked
+    def update_one(self, filter_q: Dict[str, Any], update: Dict[str, Any], upsert: bool = False) -> UpdateResult:
+        return UpdateResult(self._update(filter_q, update, upsert, many=False), True)
+
+    @_locked
+    def update_many(self, filter_q: Dict[str, Any], update: Dict[str, Any], upsert: bool = False) -> UpdateResult:
+        return UpdateResult(self._update(filter_q, update, upsert, many=True), True)
+
+    @_locked
+    def find_one_and_update(self, filter_q: Dict[str, Any], update: Dict[str, Any], projection: Any = None,
+                            sort: Any = None, upsert: bool = False,
+                            return_document: bool = ReturnDocument.BEFORE) -> Optional[dict]:
+        if sort:
+            first = self.find_one(filter_q, {'_id': 1}, sort=sort)
+            if first is not None:
+                filter_q = {'_id': first['_id']}
+        before = self._matching(filter_q, first=True)
+        before_copy = copy.deepcopy(before[0]) if before else None
+        raw = self._update(filter_q, update, upsert, many=False)
+        if return_document == ReturnDocument.AFTER:
+            doc_id = raw.get('upserted', before_copy['_id'] if before_copy else None)
+            after = self._docs.get(doc_id) if doc_id is not None else None
+            return _project(after, projection) if after is not None else None
+        return _project(before_copy, projection) if before_copy is not None else None
+
+    def _delete(self, query: Dict[str, Any], many: bool) -> int:
+        matched = self._matching(query, first=not many)
+        for doc in matched:
+            for index in self._indexes.values():
+                index.remove(doc)
+            del self._docs[doc['_id']]
+        if matched:
+            self._touch()
+        return len(matched)
+
+    @_locked
+    def delete_one(self, query: Dict[str, Any]) -> DeleteResult:
+        return DeleteResult({'n': self._delete(query, many=False)}, True)
+
+    @_locked
+    def delete_many(self, query: Dict[str, Any]) -> DeleteResult:
+        return DeleteResult({'n': self._delete(query, many=True)}, True)
+
+    @_locked
+    def bulk_write(self, requests: Iterable[Any], ordered: bool = True) -> BulkWriteResult:
+        result = {'writeErrors': [], 'writeConcernErrors': [], 'nInserted': 0, 'nUpserted': 0,
+                  'nMatched': 0, 'nModified': 0, 'nRemoved': 0, 'upserted': []}
+        for i, req in enumerate(requests):
+            kind = type(req).__name__
+            try:
+                if kind == 'InsertOne':
+                    self._insert(req._doc)
+                    result['nInserted'] += 1
+                elif kind in ('UpdateOne', 'UpdateMany'):
+                    raw = self._update(req._filter, req._doc, bool(req._upsert), many=kind == 'UpdateMany')
+                    if 'upserted' in raw:
+                        result['nUpserted'] += 1
+                        result['upserted'].append({'index': i, '_id': raw['upserted']})
+                    else:
+                        result['nMatched'] += raw['n']
+                        result['nModified'] += raw['nModified']
+                elif kind in ('DeleteOne', 'DeleteMany'):
+                    result['nRemoved'] += self._delete(req._filter, many=kind == 'DeleteMany')
+                else:
+                    raise OperationFailure(f'unsupported bulk operation: {kind}')
+            except DuplicateKeyError as exc:
+                result['writeErrors'].append({'index': i, 'code': 11000, 'errmsg': str(exc)})
+                if ordered:
+                    break
+        self._touch()
+        if result['writeErrors']:
+            raise BulkWriteError(result)
+        return BulkWriteResult(result, True)
+
+    # ---- snapshot support ----
+    @_locked
+    def _dump(self) -> Dict[str, Any]:
+        return {
+            'indexes': [{'name': ix.name, 'fields': list(ix.fields), 'unique': ix.unique}
+                        for ix in self._indexes.values() if ix.name != '_id_'],
+            'docs': list(self._docs.values()),
+        }
+
+    @_locked
+    def _restore(self, data: Dict[str, Any]) -> None:
+        for spec in data.get('indexes', []):
+            self._indexes[spec['name']] = _Index(spec['name'], tuple(spec['fields']), spec['unique'])
+        for doc in data.get('docs', []):
+            self._index_add(doc)
+            self._docs[doc['_id']] = doc
+
+
+# -------------------- DATABASE + PERSISTENCE --------------------
+class MemoryDatabase:
+    """A set of named collections with optional snapshot-to-disk persistence.
+
+    When ``path`` is given the snapshot is loaded on construction and written
+    back (atomically, via a temp file + rename) by :meth:`save`, by the
+    autosave thread and at interpreter exit.
+
+    Only one process writes the snapshot: the first to take a lock on
+    ``<path>.lock``. Other processes (further gunicorn workers) still load it
+    but keep their own changes in memory, since each would otherwise
+    overwrite the file with just its own data.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._collections: Dict[str, MemoryCollection] = {}
+        self._version = 0
+        self._saved_version = 0
+        self._lock = threading.Lock()
+        self._autosave_pid: Optional[int] = None
+        self._writer_pid: Optional[int] = None
+        self._writer = False
+        self._writer_lock: Any = None
+        if path and os.path.exists(path):
+            self.load()
+        if path:
+            atexit.register(self.save)
+
+    def __getitem__(self, name: str) -> MemoryCollection:
+        coll = self._collections.get(name)
+        if coll is None:
+            # setdefault is atomic: two threads racing here get the same collection
+            coll = self._collections.setdefault(name, MemoryCollection(name, self))
+        return coll
+
+    get_collection = __getitem__
+
+    def list_collection_names(self) -> List[str]:
+        return list(self._collections)
+
+    def load(self) -> None:
+        with open(self.path, 'r', encoding='utf-8') as fh:
+            data = json_util.loads(fh.read())
+        for name, coll_data in data.get('collections', {}).items():
+            self[name]._restore(coll_data)
+        self._saved_version = self._version = 0
+
+    def _is_writer(self) -> bool:
+        if self._writer_pid == os.getpid():
+            return self._writer
+        self._writer_pid = os.getpid()
+        self._writer = True
+        if fcntl is not None:
+            fh = open(self.path + '.lock', 'a')
+            try:
+                fcntl.flock(fh, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                self._writer_lock = fh  # held until the process exits
+            except OSError:
+                fh.close()
+                self._writer = False
+                print(f'{self.path} is written by another process; changes made in this one '
+                      'are not persisted (run a single worker to keep them).')
+        return self._writer
+
+    def save(self) -> bool:
+        if not self.path:
+            return False
+        with self._lock:
+            if not self._is_writer():
+                return False
+            version = self._version
+            if version == self._saved_version and os.path.exists(self.path):
+                return False
+            payload = json_util.dumps({
+                'saved_at': time.time(),
+                'collections': {name: coll._dump() for name, coll in list(self._collections.items())},
+            })
+            directory = os.path.dirname(os.path.abspath(self.path))
+            fd, tmp = tempfile.mkstemp(prefix='.memstore-', dir=directory)
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as fh:
+                    fh.write(payload)
+                os.replace(tmp, self.path)
+            except BaseException:
+                if os.path.exists(tmp):
+                    os.unlink(tmp)
+                raise
+            self._saved_version = version
+            return True
+
+    def start_autosave(self, interval: float) -> None:
+        if not self.path or interval <= 0 or self._autosave_pid == os.getpid():
+            return
+        with self._lock:
+            if self._autosave_pid == os.getpid():
+                return
+            self._autosave_pid = os.getpid()
+
+        def _loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.save()
+                except Exception as e:
+                    print('In-memory DB snapshot failed:', e)
+
+        threading.Thread(target=_loop, name='memstore-autosave', daemon=True).start()
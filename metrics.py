@@ -0,0 +1,237 @@
+"""Request and database timings exposed as Prometheus text at ``/metrics``.
+
+Everything is kept in process memory: a histogram observation is a binary
+search and two additions under a lock, cheap enough to leave on. Each
+gunicorn worker reports its own numbers (the ``pid`` in ``app_info`` tells
+them apart).
+
+* ``http_request_duration_seconds`` per route, from before/after request hooks
+* ``http_request_db_seconds`` per route: MongoDB time spent inside the request
+* ``mongodb_command_duration_seconds`` per command, from a pymongo
+  ``CommandListener`` passed to ``MongoClient(event_listeners=...)``
+* ``template_render_seconds`` per template and ``app_section_seconds`` for
+  other timed work (password hashing)
+* commands slower than ``slow_query_ms`` are printed with the shape of their
+  filter (field names only, never values)
+"""
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from flask import Flask, Response, abort, before_render_template, request, template_rendered
+from pymongo import monitoring
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+INF_LABEL = 'le="+Inf"'
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    __slots__ = ('bounds', 'counts', 'sum', 'count')
+
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _fmt_labels(labels: Labels, extra: str = '') -> str:
+    parts = [f'{k}="{_escape(str(v))}"' for k, v in labels]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _shape(command: Dict[str, Any]) -> str:
+    """Field names of a command's filter, for the slow-query log."""
+    spec = command.get('filter') or command.get('query')
+    for key in ('updates', 'deletes'):
+        if spec is None and command.get(key):
+            spec = command[key][0].get('q')
+    if spec is None and command.get('pipeline'):
+        return 'pipeline[' + ','.join(next(iter(s)) for s in command['pipeline']) + ']'
+    return '{' + ','.join(spec) + '}' if isinstance(spec, dict) else ''
+
+
+class CommandTimer(monitoring.CommandListener):
+    """pymongo listener feeding per-command latencies into :class:`Metrics`."""
+
+    def __init__(self, metrics: 'Metrics'):
+        self.metrics = metrics
+        self._inflight: Dict[Tuple[Any, int], Tuple[str, Dict[str, Any]]] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        target = event.command.get(event.command_name)
+        self._inflight[(event.connection_id, event.request_id)] = (
+            target if isinstance(target, str) else '', event.command)
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._finish(event, 'ok')
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self._finish(event, 'error')
+
+    def _finish(self, event: Any, outcome: str) -> None:
+        collection, command = self._inflight.pop((event.connection_id, event.request_id), ('', {}))
+        seconds = event.duration_micros / 1e6
+        self.metrics.observe_command(event.command_name, collection, outcome, seconds)
+        if seconds * 1000 >= self.metrics.slow_query_ms:
+            print(f"Slow MongoDB {event.command_name} on {event.database_name}.{collection}: "
+                  f"{seconds * 1000:.1f} ms {_shape(command)}")
+
+
+class Metrics:
+    def __init__(self, app: Optional[Flask] = None, slow_query_ms: float = 100.0,
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS, token: Optional[str] = None):
+        self.slow_query_ms = slow_query_ms
+        self.buckets = buckets
+        self.token = token
+        self._meta: Dict[str, Tuple[str, str]] = {}
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._collectors: List[Callable[[], Iterable[Tuple[str, Dict[str, str], float]]]] = []
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self.command_listener = CommandTimer(self)
+
+        self.describe('http_request_duration_seconds', 'histogram', 'Request latency by route.')
+        self.describe('http_request_db_seconds', 'histogram', 'MongoDB time spent inside a request.')
+        self.describe('http_requests_total', 'counter', 'Requests by route and status.')
+        self.describe('mongodb_command_duration_seconds', 'histogram', 'MongoDB command latency.')
+        self.describe('template_render_seconds', 'histogram', 'Jinja render time by template.')
+        self.describe('app_section_seconds', 'histogram', 'Time spent in instrumented sections.')
+        self.describe('app_info', 'gauge', 'Worker process serving this scrape.')
+        if app is not None:
+            self.init_app(app)
+
+    # ---- recording ----
+    def describe(self, name: str, kind: str, help_text: str) -> None:
+        self._meta[name] = (kind, help_text)
+
+    def observe(self, name: str, labels: Dict[str, str], value: float) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = Histogram(self.buckets)
+            hist.observe(value)
+
+    def inc(self, name: str, labels: Dict[str, str], amount: float = 1.0) -> None:
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0.0) + amount
+
+    def collector(self, fn: Callable[[], Iterable[Tuple[str, Dict[str, str], float]]]) -> None:
+        """Register ``fn`` returning ``(name, labels, value)`` samples read at scrape time."""
+        self._collectors.append(fn)
+
+    def observe_command(self, command: str, collection: str, outcome: str, seconds: float) -> None:
+        self.observe('mongodb_command_duration_seconds',
+                     {'command': command, 'collection': collection, 'outcome': outcome}, seconds)
+        if getattr(self._local, 'db_seconds', None) is not None:
+            self._local.db_seconds += seconds
+
+    def observe_section(self, section: str, seconds: float) -> None:
+        self.observe('app_section_seconds', {'section': section}, seconds)
+
+    @contextmanager
+    def timed(self, section: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe_section(section, time.perf_counter() - start)
+
+    # ---- Flask integration ----
+    def init_app(self, app: Flask) -> None:
+        app.before_request(self._before)
+        app.after_request(self._after)
+        app.teardown_request(self._teardown)
+        before_render_template.connect(self._render_started, app)
+        template_rendered.connect(self._render_finished, app)
+        app.add_url_rule('/metrics', 'metrics', self.view)
+
+    def _before(self) -> None:
+        self._local.start = time.perf_counter()
+        self._local.db_seconds = 0.0
+
+    def _record(self, status: int) -> None:
+        start = getattr(self._local, 'start', None)
+        if start is None:
+            return
+        self._local.start = None
+        route = request.url_rule.rule if request.url_rule else '<unmatched>'
+        labels = {'route': route, 'method': request.method}
+        self.observe('http_request_duration_seconds', labels, time.perf_counter() - start)
+        self.observe('http_request_db_seconds', labels, self._local.db_seconds)
+        self._local.db_seconds = None
+        self.inc('http_requests_total', dict(labels, status=str(status)))
+
+    def _after(self, response: Response) -> Response:
+        self._record(response.status_code)
+        return response
+
+    def _teardown(self, exc: Optional[BaseException]) -> None:
+        # after_request does not run when a view raises
+        self._record(500)
+
+    def _render_started(self, sender: Flask, template: Any, context: Dict[str, Any], **extra) -> None:
+        self._local.render_start = time.perf_counter()
+
+    def _render_finished(self, sender: Flask, template: Any, context: Dict[str, Any], **extra) -> None:
+        start = getattr(self._local, 'render_start', None)
+        if start is not None:
+            self.observe('template_render_seconds', {'template': template.name or ''},
+                         time.perf_counter() - start)
+            self._local.render_start = None
+
+    # ---- exposition ----
+    def render(self) -> str:
+        lines: List[str] = []
+        by_name: Dict[str, List[str]] = {}
+        with self._lock:
+            histograms = [(k, list(h.counts), h.sum, h.count) for k, h in self._histograms.items()]
+            counters = list(self._counters.items())
+        for (name, labels), counts, total, count in histograms:
+            out = by_name.setdefault(name, [])
+            running = 0
+            for bound, n in zip(self.buckets, counts):
+                running += n
+                le = f'le="{bound}"'
+                out.append(f'{name}_bucket{_fmt_labels(labels, le)} {running}')
+            out.append(f'{name}_bucket{_fmt_labels(labels, INF_LABEL)} {count}')
+            out.append(f'{name}_sum{_fmt_labels(labels)} {total}')
+            out.append(f'{name}_count{_fmt_labels(labels)} {count}')
+        samples = [(name, labels, value) for (name, labels), value in counters]
+        samples.append(('app_info', (('pid', str(os.getpid())),), 1))
+        for fn in self._collectors:
+            for name, labels, value in fn():
+                samples.append((name, tuple(sorted(labels.items())), value))
+        for name, labels, value in samples:
+            by_name.setdefault(name, []).append(f'{name}{_fmt_labels(labels)} {value}')
+        for name in sorted(by_name):
+            kind, help_text = self._meta.get(name, ('untyped', ''))
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            lines.extend(by_name[name])
+        return '\n'.join(lines) + '\n'
+
+    def view(self) -> Response:
+        if self.token and request.headers.get('Authorization') != f'Bearer {self.token}':
+            abort(401)
+        return Response(self.render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,82 @@
+"""Render-once cache for pages whose HTML is the same for every visitor.
+
+The lesson pages take no per-user context, so each worker renders them once
+(re-rendering only when the template file changes), keeps identity, gzip and
+optionally brotli bodies, and answers repeat visits with a 304 against a
+strong ETag.
+"""
+import gzip
+import hashlib
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+from flask import Flask, Response, current_app, render_template, request
+
+from assets import brotli
+
+
+class _Entry:
+    __slots__ = ('mtime', 'variants')
+
+    def __init__(self, mtime: int, variants: Dict[Optional[str], Tuple[bytes, str]]):
+        self.mtime = mtime
+        self.variants = variants
+
+
+class PageCache:
+    def __init__(self, app: Optional[Flask] = None):
+        self._entries: Dict[str, _Entry] = {}
+        self._paths: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app: Flask) -> None:
+        # Read on every render, so it can be switched after construction
+        app.config.setdefault('PAGE_CACHE', True)
+
+    def _template_mtime(self, name: str) -> int:
+        path = self._paths.get(name)
+        if path is None:
+            env = current_app.jinja_env
+            _, path, _ = env.loader.get_source(env, name)
+            self._paths[name] = path
+        return os.stat(path).st_mtime_ns
+
+    def _build(self, name: str, mtime: int) -> _Entry:
+        body = render_template(name).encode('utf-8')
+        digest = hashlib.sha256(body).hexdigest()[:20]
+        variants: Dict[Optional[str], Tuple[bytes, str]] = {
+            None: (body, digest),
+            'gzip': (gzip.compress(body, 9, mtime=0), f'{digest}-gz'),
+        }
+        if brotli is not None:
+            variants['br'] = (brotli.compress(body, quality=11), f'{digest}-br')
+        return _Entry(mtime, variants)
+
+    def render(self, name: str) -> Response:
+        if not current_app.config['PAGE_CACHE'] or current_app.debug:
+            return Response(render_template(name), mimetype='text/html')
+
+        mtime = self._template_mtime(name)
+        entry = self._entries.get(name)
+        if entry is None or entry.mtime != mtime:
+            entry = self._build(name, mtime)
+            with self._lock:
+                self._entries[name] = entry
+
+        encoding = None
+        for candidate in ('br', 'gzip'):
+            if candidate in entry.variants and request.accept_encodings[candidate]:
+                encoding = candidate
+                break
+        body, etag = entry.variants[encoding]
+
+        response = Response(body, mimetype='text/html')
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        response.vary.add('Accept-Encoding')
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        return response.make_conditional(request)
@@ -0,0 +1,109 @@
+"""Password hashing off the request thread.
+
+Werkzeug's scrypt/pbkdf2 hashes cost tens of milliseconds of CPU each. The
+work runs in a small, bounded process pool so a burst of logins cannot pile
+up unbounded CPU work behind the web workers, and hashes made with outdated
+parameters are reported so callers can upgrade them on the next login.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class HashingBusy(Exception):
+    """Raised when the hashing queue is full; the caller should back off."""
+
+
+class PasswordHasher:
+    """Hash and verify passwords with a configurable Werkzeug method.
+
+    ``workers=0`` hashes inline. Otherwise at most ``workers`` processes do
+    the work and at most ``max_pending`` requests may wait for them; beyond
+    that :class:`HashingBusy` is raised after ``wait_timeout`` seconds.
+    ``observe(section, seconds)``, if given, receives the time each hash or
+    check took, queueing included.
+    """
+
+    def __init__(self, method: str = 'scrypt', workers: int = 2, max_pending: int = 32,
+                 wait_timeout: float = 5.0, observe: Optional[Callable[[str, float], None]] = None):
+        self.method = method
+        self.observe = observe
+        self.workers = workers
+        self.wait_timeout = wait_timeout
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self._method_prefix: Optional[str] = None
+
+    def _executor(self) -> Optional[ProcessPoolExecutor]:
+        if self.workers <= 0:
+            return None
+        if self._pool_pid != os.getpid():
+            with self._lock:
+                if self._pool_pid != os.getpid():
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        # spawn, not fork: the web process has live threads
+                        mp_context=multiprocessing.get_context('spawn'),
+                    )
+                    self._pool_pid = os.getpid()
+        return self._pool
+
+    def _run(self, fn, *args):
+        if self.observe is None:
+            return self._call(fn, *args)
+        start = time.perf_counter()
+        try:
+            return self._call(fn, *args)
+        finally:
+            self.observe('password_hash' if fn is generate_password_hash else 'password_verify',
+                         time.perf_counter() - start)
+
+    def _call(self, fn, *args):
+        pool = self._executor()
+        if pool is None:
+            return fn(*args)
+        if not self._slots.acquire(timeout=self.wait_timeout):
+            raise HashingBusy('password hashing queue is full')
+        try:
+            return pool.submit(fn, *args).result()
+        except BrokenProcessPool:
+            self._pool_pid = None
+            return fn(*args)
+        finally:
+            self._slots.release()
+
+    def hash(self, password: str) -> str:
+        return self._run(generate_password_hash, password, self.method)
+
+    def hash_many(self, passwords: Sequence[str], chunksize: int = 8) -> List[str]:
+        """Hash a batch across every pool process (bulk imports).
+
+        Not subject to ``max_pending``; keep it out of request handlers.
+        """
+        pool = self._executor()
+        if pool is None:
+            return [generate_password_hash(p, self.method) for p in passwords]
+        return list(pool.map(generate_password_hash, passwords, [self.method] * len(passwords),
+                             chunksize=chunksize))
+
+    def needs_rehash(self, stored: str) -> bool:
+        if self._method_prefix is None:
+            # Werkzeug expands defaults ("scrypt" -> "scrypt:32768:8:1"), so
+            # learn the stored prefix from a throwaway hash once.
+            self._method_prefix = generate_password_hash('', self.method).split('$', 1)[0]
+        return stored.split('$', 1)[0] != self._method_prefix
+
+    def verify(self, stored: str, password: str) -> Tuple[bool, bool]:
+        """Return ``(matches, needs_rehash)`` for a stored hash."""
+        if not stored:
+            return False, False
+        ok = self._run(check_password_hash, stored, password)
+        return ok, ok and self.needs_rehash(stored)
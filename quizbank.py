@@ -0,0 +1,134 @@
+"""Quiz questions and answer keys, kept on the server.
+
+The bank is read once per process into slotted tuples with normalized answer
+keys, so serving a quiz is a dictionary lookup and grading a whole submission
+is a single pass over it. A quiz set is a seeded shuffle of the questions and their
+options; seeds are folded into a small space so every set is a stable,
+cacheable JSON document.
+"""
+import hashlib
+import json
+import random
+import threading
+from typing import Dict, List, Mapping, Optional, Tuple
+
+SEED_SPACE = 64
+
+
+class Question:
+    __slots__ = ('id', 'prompt', 'translation', 'options', 'answer')
+
+    def __init__(self, id: str, prompt: str, translation: str, options: Tuple[str, ...], answer: str):
+        self.id = id
+        self.prompt = prompt
+        self.translation = translation
+        self.options = options
+        self.answer = answer
+
+
+class Quiz:
+    __slots__ = ('subject', 'title', 'questions')
+
+    def __init__(self, subject: str, title: str, questions: Tuple[Question, ...]):
+        self.subject = subject
+        self.title = title
+        self.questions = questions
+
+
+class GradeResult:
+    __slots__ = ('score', 'total', 'correct')
+
+    def __init__(self, score: int, total: int, correct: Dict[str, bool]):
+        self.score = score
+        self.total = total
+        self.correct = correct
+
+    @property
+    def percent(self) -> int:
+        return round(self.score * 100 / self.total) if self.total else 0
+
+
+def _normalize(value: object) -> str:
+    return ' '.join(str(value).split())
+
+
+class QuizBank:
+    def __init__(self, path: str, seed_space: int = SEED_SPACE):
+        self.path = path
+        self.seed_space = seed_space
+        self.quizzes: Dict[str, Quiz] = {}
+        self.playlists: Dict[str, List[str]] = {}
+        self.version = ''
+        self._sets: Dict[Tuple[str, int, int], Tuple[bytes, str]] = {}
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self) -> None:
+        with open(self.path, 'rb') as fh:
+            raw = fh.read()
+        data = json.loads(raw)
+        quizzes = {}
+        for subject, spec in data['subjects'].items():
+            questions = []
+            for q in spec['questions']:
+                options = tuple(_normalize(o) for o in q['options'])
+                answer = _normalize(q['answer'])
+                if answer not in options:
+                    raise ValueError(f"{subject}/{q['id']}: answer is not one of the options")
+                questions.append(Question(q['id'], q['prompt'], q.get('translation', ''), options, answer))
+            quizzes[subject] = Quiz(subject, spec.get('title', subject), tuple(questions))
+        self.quizzes = quizzes
+        self.playlists = data.get('playlists', {})
+        self.version = hashlib.sha256(raw).hexdigest()[:12]
+        self._sets = {}
+
+    def get(self, subject: str) -> Optional[Quiz]:
+        return self.quizzes.get(subject)
+
+    @staticmethod
+    def _size(quiz: Quiz, n: Optional[int]) -> int:
+        count = len(quiz.questions)
+        return count if not n or n > count else max(n, 1)
+
+    def _pick(self, quiz: Quiz, seed: Optional[int], n: int) -> Tuple[List[Question], random.Random]:
+        if seed is None:
+            return list(quiz.questions[:n]), random.Random(0)
+        rng = random.Random(f'{quiz.subject}:{seed % self.seed_space}')
+        return rng.sample(quiz.questions, n), rng
+
+    def quiz_set(self, subject: str, seed: int, n: Optional[int] = None) -> Tuple[bytes, str]:
+        """Return the JSON body and ETag of one randomized set (no answers)."""
+        quiz = self.quizzes[subject]
+        seed %= self.seed_space
+        n = self._size(quiz, n)
+        key = (subject, seed, n)
+        cached = self._sets.get(key)
+        if cached is not None:
+            return cached
+        questions, rng = self._pick(quiz, seed, n)
+        items = []
+        for q in questions:
+            options = list(q.options)
+            rng.shuffle(options)
+            items.append({'id': q.id, 'prompt': q.prompt, 'translation': q.translation, 'options': options})
+        body = json.dumps({'subject': subject, 'title': quiz.title, 'seed': seed, 'n': n,
+                           'questions': items}, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        entry = (body, f'{self.version}-{subject}-{seed}-{n}')
+        with self._lock:
+            self._sets[key] = entry
+        return entry
+
+    def grade(self, subject: str, answers: Mapping[str, object],
+              seed: Optional[int] = None, n: Optional[int] = None) -> GradeResult:
+        """Grade a whole submission against the set identified by ``seed``/``n``.
+
+        The total comes from the set, not from the submission, so leaving
+        questions out counts them as wrong.
+        """
+        quiz = self.quizzes[subject]
+        questions, _ = self._pick(quiz, seed, self._size(quiz, n))
+        correct = {}
+        for q in questions:
+            given = answers.get(q.id)
+            correct[q.id] = given is not None and _normalize(given) == q.answer
+        return GradeResult(sum(correct.values()), len(questions), correct)
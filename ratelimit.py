@@ -0,0 +1,37 @@
+"""In-memory token buckets for throttling login attempts.
+
+Checked before any database read or password hashing, so a brute-force
+burst costs almost nothing. State is per worker process.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Tuple
+
+
+class TokenBucketLimiter:
+    """``burst`` tokens per key, refilled at ``per_minute`` tokens a minute.
+
+    Only the ``max_keys`` most recently seen keys are tracked, which bounds
+    memory no matter how many distinct IPs or emails show up.
+    """
+
+    def __init__(self, burst: int, per_minute: float, max_keys: int = 100000):
+        self.burst = burst
+        self.rate = per_minute / 60.0
+        self.max_keys = max_keys
+        self._buckets: 'OrderedDict[str, Tuple[float, float]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def allow(self, key: str, cost: float = 1.0) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.pop(key, (float(self.burst), now))
+            tokens = min(float(self.burst), tokens + (now - last) * self.rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return allowed
@@ -0,0 +1,110 @@
+"""Streaming roster files for ``flask import-roster`` and ``flask export-progress``.
+
+Rows are read and written one at a time, so a roster of any size is handled
+in constant memory; the import consumes them in fixed-size batches.
+"""
+import csv
+import json
+from itertools import islice
+from typing import Any, Dict, IO, Iterable, Iterator, List, Optional, Tuple
+
+import click
+
+REQUIRED_FIELDS = ('name', 'email', 'password')
+
+EXPORT_FIELDS = {
+    '_id': 0, 'email': 1, 'name': 1, 'progress': 1, 'summary': 1, 'streak': 1,
+    'history_progress': 1, 'quiz_scores': 1,
+}
+CSV_COLUMNS = [
+    'email', 'name', 'progress_total', 'subject_count', 'works_count', 'achievements_count',
+    'time_spent', 'last_activity', 'streak_current', 'streak_best', 'history_progress',
+    'progress', 'quiz_scores',
+]
+
+
+def detect_format(path: str, fmt: Optional[str]) -> str:
+    if fmt:
+        return fmt
+    lowered = path.lower()
+    if lowered.endswith('.csv'):
+        return 'csv'
+    if lowered.endswith(('.jsonl', '.ndjson', '.json')):
+        return 'jsonl'
+    raise click.BadParameter(f'cannot tell the format of {path!r}; pass --format', param_hint="'PATH'")
+
+
+def read_rows(stream: IO[str], fmt: str) -> Iterator[Tuple[int, Any]]:
+    """Yield ``(line_number, row)``; ``row`` is None for unparseable lines."""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        if reader.fieldnames:
+            reader.fieldnames = [f.strip().lower() for f in reader.fieldnames]
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_no, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            yield line_no, json.loads(line)
+        except ValueError:
+            yield line_no, None
+
+
+def clean_row(row: Any) -> Tuple[Optional[Dict[str, str]], Optional[str]]:
+    """Return ``(student, None)`` or ``(None, reason)``."""
+    if not isinstance(row, dict):
+        return None, 'unreadable row'
+    student = {k: str(row.get(k) or '').strip() for k in REQUIRED_FIELDS + ('phone',)}
+    missing = [k for k in REQUIRED_FIELDS if not student[k]]
+    if missing:
+        return None, 'missing ' + ', '.join(missing)
+    if '@' not in student['email']:
+        return None, 'invalid email'
+    return student, None
+
+
+def batched(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    it = iter(items)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
+def progress_row(user: Dict[str, Any]) -> Dict[str, Any]:
+    """Flatten one exported user for CSV output."""
+    summary = user.get('summary') or {}
+    streak = user.get('streak') or {}
+    return {
+        'email': user.get('email', ''),
+        'name': user.get('name', ''),
+        'progress_total': summary.get('progress_total', 0),
+        'subject_count': summary.get('subject_count', 0),
+        'works_count': summary.get('works_count', 0),
+        'achievements_count': summary.get('achievements_count', 0),
+        'time_spent': summary.get('time_spent', 0),
+        'last_activity': summary.get('last_activity', ''),
+        'streak_current': streak.get('current', 0),
+        'streak_best': streak.get('best', 0),
+        'history_progress': user.get('history_progress', 0),
+        'progress': json.dumps(user.get('progress') or {}, ensure_ascii=False, sort_keys=True),
+        'quiz_scores': json.dumps(user.get('quiz_scores') or {}, ensure_ascii=False, sort_keys=True),
+    }
+
+
+def write_progress(users: Iterable[Dict[str, Any]], out: IO[str], fmt: str) -> int:
+    count = 0
+    if fmt == 'csv':
+        writer = csv.DictWriter(out, fieldnames=CSV_COLUMNS, lineterminator='\n')
+        writer.writeheader()
+        for user in users:
+            writer.writerow(progress_row(user))
+            count += 1
+    else:
+        for user in users:
+            out.write(json.dumps(user, ensure_ascii=False, default=str) + '\n')
+            count += 1
+    return count
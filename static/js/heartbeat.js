@@ -0,0 +1,22 @@
+// Time-on-task reporting for student pages. While the page is visible it
+// posts /heartbeat every data-interval seconds, tagged with data-subject:
+//   <script src=".../heartbeat.js" data-subject="math" data-interval="30"></script>
+// Each ping is credited as one interval, so hidden tabs and closed pages
+// simply stop counting.
+(function () {
+    const script = document.currentScript;
+    const subject = script.dataset.subject || 'general';
+    const interval = (parseInt(script.dataset.interval, 10) || 30) * 1000;
+
+    const timer = setInterval(function () {
+        if (document.visibilityState !== 'visible') return;
+        fetch('/heartbeat', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ subject: subject }),
+            keepalive: true
+        }).then(function (res) {
+            if (res.status === 401) clearInterval(timer);  // not logged in
+        }).catch(function () { /* offline: try again next tick */ });
+    }, interval);
+})();
@@ -0,0 +1,146 @@
+// Video-then-quiz flow shared by the primary subject pages and history.
+// Each page defines a QUIZ object before loading this file:
+//   videoId  - YouTube video shown before the questions
+//   subject  - quiz bank subject: questions come from /api/quiz/<subject>
+//              and answers are graded by /api/quiz/<subject>/grade
+//   badges   - minimum scores for { gold, silver, bronze }
+//   images   - badge image URLs { gold, silver, bronze, none }
+// The answer keys never reach the page.
+const QUIZ_SEEDS = 64;  // matches quizbank.SEED_SPACE so sets stay cacheable
+let player;
+let quizSet = null;
+
+function loadQuestions() {
+    const seed = Math.floor(Math.random() * QUIZ_SEEDS);
+    fetch('/api/quiz/' + QUIZ.subject + '?seed=' + seed)
+        .then(function (res) { return res.json(); })
+        .then(renderQuestions)
+        .catch(function () {
+            document.getElementById('question-list').innerText =
+                'Could not load the questions. Please refresh the page.';
+        });
+}
+
+function renderQuestions(set) {
+    quizSet = set;
+    const list = document.getElementById('question-list');
+    list.textContent = '';
+    set.questions.forEach(function (q, i) {
+        const div = document.createElement('div');
+        div.className = 'question';
+        const prompt = document.createElement('p');
+        prompt.textContent = (i + 1) + '. ' + q.prompt;
+        div.appendChild(prompt);
+        if (q.translation) {
+            const translation = document.createElement('p');
+            translation.textContent = q.translation;
+            div.appendChild(translation);
+        }
+        div.appendChild(document.createElement('br'));
+        q.options.forEach(function (option) {
+            const label = document.createElement('label');
+            const input = document.createElement('input');
+            input.type = 'radio';
+            input.name = q.id;
+            input.value = option;
+            label.appendChild(input);
+            label.appendChild(document.createTextNode(' ' + option + ' '));
+            div.appendChild(label);
+            div.appendChild(document.createElement('br'));
+        });
+        list.appendChild(div);
+    });
+}
+
+function onYouTubeIframeAPIReady() {
+    player = new YT.Player('player', {
+        height: '100%',
+        width: '100%',
+        videoId: QUIZ.videoId,
+        playerVars: {
+            'autoplay': 1,
+            'mute': 1,
+            'controls': 1,
+            'modestbranding': 1,
+            'fs': 1
+        },
+        events: {
+            'onStateChange': onPlayerStateChange,
+            'onError': onPlayerError
+        }
+    });
+}
+
+// When video ends
+function onPlayerStateChange(event) {
+    if (event.data === YT.PlayerState.ENDED) {
+        document.getElementById('player').style.display = 'none';
+        const q = document.getElementById('questions');
+        q.classList.add('show');
+    }
+}
+
+function onPlayerError(event) {
+    // Hide player and show fallback link
+    document.getElementById('player').style.display = 'none';
+    const fallback = document.getElementById('player-error');
+    if (fallback) fallback.style.display = 'block';
+}
+
+function showBadge(score) {
+    let badge = document.getElementById("badge");
+    let badgeText = document.getElementById("badge-text");
+    let badgeImg = document.getElementById("badge-img");
+    let correctSound = document.getElementById("correct-sound");
+    let wrongSound = document.getElementById("wrong-sound");
+
+    if (score >= QUIZ.badges.gold) {
+        badgeText.innerText = "🏆 Gold Badge! Perfect Score!";
+        badgeImg.src = QUIZ.images.gold;
+        correctSound.play();
+    } else if (score >= QUIZ.badges.silver) {
+        badgeText.innerText = "🥈 Silver Badge! Great Job!";
+        badgeImg.src = QUIZ.images.silver;
+        correctSound.play();
+    } else if (score >= QUIZ.badges.bronze) {
+        badgeText.innerText = "🥉 Bronze Badge! Keep Practicing!";
+        badgeImg.src = QUIZ.images.bronze;
+        correctSound.play();
+    } else {
+        badgeText.innerText = "❌ No Badge. Try Again!";
+        badgeImg.src = QUIZ.images.none;
+        wrongSound.play();
+    }
+
+    badge.style.display = "block";
+}
+
+// One request grades the whole quiz and credits progress (and, for
+// history, unlocks the next video)
+function checkAnswers() {
+    if (!quizSet) return;
+    const answers = {};
+    quizSet.questions.forEach(function (q) {
+        const checked = document.querySelector('input[name="' + q.id + '"]:checked');
+        if (checked) answers[q.id] = checked.value;
+    });
+
+    fetch('/api/quiz/' + QUIZ.subject + '/grade', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({
+            answers: answers,
+            seed: quizSet.seed,
+            video_index: QUIZ.videoIndex || 0
+        })
+    })
+        .then(function (res) { return res.json(); })
+        .then(function (result) { showBadge(result.score); })
+        .catch(function () {
+            document.getElementById('badge-text').innerText =
+                'Could not check your answers. Please try again.';
+            document.getElementById('badge').style.display = 'block';
+        });
+}
+
+loadQuestions();
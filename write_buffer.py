@@ -0,0 +1,217 @@
+"""Write-behind buffer that coalesces small per-student updates.
+
+Progress pings from the game templates arrive many times a second for the
+same few documents. Instead of one ``update_one`` round trip each, pending
+updates are merged per filter in memory and written with a single unordered
+``bulk_write`` every ``max_staleness`` seconds, or sooner once ``max_pending``
+distinct documents are waiting.
+
+An update that cannot be folded into what is already pending for its
+document (conflicting paths, or an operator such as ``$unset``) starts a new
+entry queued behind it; entries for one document are written in order.
+``add`` itself never touches the database.
+
+A batch that fails is pinned to the collection it was sent to (see
+``CollectionProxy.resolve`` in datastore.py) and retried there only, so
+writes meant for MongoDB never end up in the in-memory fallback.
+"""
+import atexit
+import copy
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+# Operators whose effects can be folded together without changing the result.
+MERGEABLE_OPS = ('$set', '$setOnInsert', '$inc', '$max', '$min', '$addToSet', '$push')
+
+
+def _paths_conflict(a: str, b: str) -> bool:
+    return a == b or a.startswith(b + '.') or b.startswith(a + '.')
+
+
+def _each(arg: Any) -> List[Any]:
+    return list(arg['$each']) if isinstance(arg, dict) and '$each' in arg else [arg]
+
+
+class _Pending:
+    __slots__ = ('filter', 'update', 'upsert', 'ops_by_path', 'since', 'sealed', 'target')
+
+    def __init__(self, filter_q: Dict[str, Any], upsert: bool):
+        self.filter = filter_q
+        self.update: Dict[str, Dict[str, Any]] = {}
+        self.upsert = upsert
+        self.ops_by_path: Dict[str, str] = {}
+        self.since = time.monotonic()
+        self.sealed = False
+        self.target: Any = None  # set once a write to it has failed
+
+    def seal(self, update: Dict[str, Any]) -> None:
+        # Kept verbatim and never merged into
+        self.update = copy.deepcopy(update)
+        self.sealed = True
+
+    def can_merge(self, update: Dict[str, Any]) -> bool:
+        if self.sealed or self.target is not None:
+            return False
+        for op, fields in update.items():
+            if op not in MERGEABLE_OPS:
+                return False
+            for path, arg in fields.items():
+                if op == '$push' and isinstance(arg, dict) and '$position' in arg:
+                    return False
+                for pending_path, pending_op in self.ops_by_path.items():
+                    if _paths_conflict(path, pending_path) and (pending_op != op or path != pending_path):
+                        return False
+        return True
+
+    def merge(self, update: Dict[str, Any]) -> None:
+        for op, fields in update.items():
+            target = self.update.setdefault(op, {})
+            for path, arg in fields.items():
+                self.ops_by_path[path] = op
+                if path not in target:
+                    if op in ('$push', '$addToSet'):
+                        merged = {'$each': _each(arg)}
+                        if isinstance(arg, dict) and '$slice' in arg:
+                            merged['$slice'] = arg['$slice']
+                        target[path] = merged
+                    else:
+                        target[path] = copy.deepcopy(arg)
+                elif op == '$set':
+                    target[path] = copy.deepcopy(arg)
+                elif op == '$inc':
+                    target[path] += arg
+                elif op == '$max':
+                    target[path] = max(target[path], arg)
+                elif op == '$min':
+                    target[path] = min(target[path], arg)
+                elif op == '$push':
+                    target[path]['$each'].extend(_each(arg))
+                    if isinstance(arg, dict) and '$slice' in arg:
+                        target[path]['$slice'] = arg['$slice']
+                elif op == '$addToSet':
+                    items = target[path]['$each']
+                    items.extend(v for v in _each(arg) if v not in items)
+                # $setOnInsert: the first value wins, as it would in MongoDB
+
+
+def _filter_key(filter_q: Dict[str, Any]) -> Tuple:
+    return tuple(sorted((k, repr(v)) for k, v in filter_q.items()))
+
+
+class WriteBehindBuffer:
+    """Coalesce updates per filter and flush them in bulk.
+
+    ``max_staleness`` bounds how long (in seconds) an accepted update may sit
+    in memory before it reaches the database; ``max_pending`` forces an early
+    flush when that many documents have pending changes.
+    """
+
+    def __init__(self, collection: Any, max_staleness: float = 2.0, max_pending: int = 500):
+        self.collection = collection
+        self.max_staleness = max_staleness
+        self.max_pending = max_pending
+        # Per document, the entries still to write, oldest first
+        self._pending: Dict[Tuple, List[_Pending]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._flusher_pid: Optional[int] = None
+        atexit.register(self.flush)
+
+    def add(self, filter_q: Dict[str, Any], update: Dict[str, Any], upsert: bool = False) -> None:
+        self._ensure_flusher()
+        key = _filter_key(filter_q)
+        with self._lock:
+            chain = self._pending.setdefault(key, [])
+            entry = chain[-1] if chain else None
+            if entry is None or entry.upsert != upsert or not entry.can_merge(update):
+                # Conflicting paths cannot share one update document; queue a
+                # new entry behind the older state so ordering is preserved.
+                entry = _Pending(filter_q, upsert)
+                chain.append(entry)
+                if not entry.can_merge(update):
+                    entry.seal(update)
+            if not entry.sealed:
+                entry.merge(update)
+            full = len(self._pending) >= self.max_pending
+        if full:
+            self._wake.set()
+
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def flush(self) -> int:
+        with self._flush_lock:
+            with self._lock:
+                chains = list(self._pending.items())
+                self._pending = {}
+            if not chains:
+                return 0
+            resolve = getattr(self.collection, 'resolve', None)
+            live = resolve()[1] if resolve else self.collection
+            written = 0
+            depth = 0
+            # First entries of every document, then second entries, ...
+            while True:
+                groups: Dict[int, Tuple[Any, List[Tuple[Tuple, List[_Pending]]]]] = {}
+                for key, chain in chains:
+                    if len(chain) > depth:
+                        target = live if chain[depth].target is None else chain[depth].target
+                        groups.setdefault(id(target), (target, []))[1].append((key, chain))
+                if not groups:
+                    return written
+                failed = []
+                for target, batch in groups.values():
+                    if self._write(target, [chain[depth] for _, chain in batch]):
+                        written += len(batch)
+                        continue
+                    for key, chain in batch:
+                        chain[depth].target = target
+                        failed.append((key, chain[depth:]))
+                if failed:
+                    self._requeue(failed)
+                    done = {key for key, _ in failed}
+                    chains = [(key, chain) for key, chain in chains if key not in done]
+                depth += 1
+
+    def _write(self, collection: Any, entries: List[_Pending]) -> bool:
+        """Write ``entries`` (one per document); False if they should be retried."""
+        ops = [UpdateOne(e.filter, e.update, upsert=e.upsert) for e in entries]
+        try:
+            collection.bulk_write(ops, ordered=False)
+        except BulkWriteError as e:
+            # Per-document errors will not succeed on retry; report and drop.
+            print('Write-behind flush had errors:', e.details.get('writeErrors'))
+        except Exception as e:
+            print('Write-behind flush failed, will retry:', e)
+            return False
+        return True
+
+    def _requeue(self, chains: List[Tuple[Tuple, List[_Pending]]]) -> None:
+        # Unwritten entries go back in front of anything added meanwhile.
+        with self._lock:
+            for key, older in chains:
+                self._pending[key] = older + self._pending.get(key, [])
+
+    def _ensure_flusher(self) -> None:
+        if self._flusher_pid == os.getpid():
+            return
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+        threading.Thread(target=self._run, name='write-behind-flusher', daemon=True).start()
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self.max_staleness)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print('Write-behind flush failed:', e)